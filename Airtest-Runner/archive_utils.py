@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+# Airtest-Runner/archive_utils.py
+
+import os
+import io
+import json
+import time
+import hashlib
+import tarfile
+import zipfile
+import mimetypes
+import threading
+import posixpath
+from urllib.parse import unquote, urlparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# 读写文件使用的块大小
+BLOCK_SIZE = 1024 * 1024
+MANIFEST_FILE = "manifest.json"
+INDEX_FILE = "index.html"
+# 运行目录和静态资源在归档中的位置，与 result/runs/<运行>/result.html 引用 ../../../source/ 的相对路径一致
+ARCHIVE_RUNS_DIR = "runs"
+ARCHIVE_SOURCE_DIR = "source"
+# 只打包报告页面需要的静态资源目录
+STATIC_DIRS = ("css", "js", "fonts", "image")
+# 已经压缩过的格式直接存储，不再浪费时间压缩
+COMPRESSED_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp", ".gif", ".mp4", ".avi", ".zip", ".gz", ".7z",
+                         ".woff", ".woff2")
+# 进度回调的最小间隔(秒)
+PROGRESS_INTERVAL = 0.5
+
+
+def collect_files(run_dir, source_dir=None):
+    """ 列出需要打包的文件，返回 [(本地路径, 归档中的路径, 大小)]。"""
+    run_name = os.path.basename(os.path.normpath(run_dir))
+    roots = [(run_dir, f"{ARCHIVE_RUNS_DIR}/{run_name}")]
+    if source_dir:
+        roots += [(os.path.join(source_dir, name), f"{ARCHIVE_SOURCE_DIR}/{name}") for name in STATIC_DIRS]
+    files = []
+    for root, prefix in roots:
+        for dirpath, _, filenames in os.walk(root):
+            for filename in sorted(filenames):
+                if filename.endswith(".tmp"):
+                    continue
+                path = os.path.join(dirpath, filename)
+                relative = os.path.relpath(path, root).replace("\\", "/")
+                try:
+                    files.append((path, f"{prefix}/{relative}", os.path.getsize(path)))
+                except OSError:
+                    continue
+    return files
+
+
+class _HashingReader:
+    """ 读取文件的同时计算 SHA-256，打包时每个文件只读一遍。"""
+
+    def __init__(self, f):
+        self.f = f
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def read(self, size=-1):
+        data = self.f.read(size)
+        self.sha256.update(data)
+        self.size += len(data)
+        return data
+
+
+class _Progress:
+    def __init__(self, total_bytes, total_files, on_progress):
+        self.total_bytes = total_bytes
+        self.total_files = total_files
+        self.on_progress = on_progress
+        self.done_bytes = 0
+        self.done_files = 0
+        self.last_report = 0
+
+    def update(self, size):
+        self.done_bytes += size
+        self.done_files += 1
+        now = time.time()
+        if self.on_progress and now - self.last_report >= PROGRESS_INTERVAL:
+            self.last_report = now
+            self.on_progress(self.done_bytes, self.total_bytes, self.done_files, self.total_files)
+
+
+def _index_page(run_name):
+    target = f"{ARCHIVE_RUNS_DIR}/{run_name}/result.html"
+    return ("<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\">"
+            f"<meta http-equiv=\"refresh\" content=\"0; url={target}\"></head>"
+            f"<body><a href=\"{target}\">{target}</a></body></html>\n").encode("utf-8")
+
+
+def export_run(run_dir, output_path, fmt=None, source_dir=None, on_progress=None):
+    """
+    把一次运行流式打包成单个 zip 或 tar 文件：逐个文件按 BLOCK_SIZE 读写，不在内存或临时目录中汇总；
+    zip 中已经压缩过的截图直接存储，其余文件使用 deflate。
+    归档中包含报告需要的静态资源、跳转到 result.html 的 index.html，以及最后写入的 manifest.json
+    (每个文件的大小和 SHA-256)，可以用 view_archive 直接打开而无需解压。
+
+    Args:
+        run_dir (str): 运行目录(result/runs/<运行>).
+        output_path (str): 输出文件路径.
+        fmt (str): "zip" 或 "tar"，默认按 output_path 的扩展名判断.
+        source_dir (str): 静态资源所在的 source 目录，默认为当前目录下的 source.
+        on_progress (callable): on_progress(已写字节, 总字节, 已写文件数, 总文件数).
+
+    Returns:
+        dict: manifest 内容.
+    """
+    fmt = fmt or ("tar" if output_path.endswith(".tar") else "zip")
+    source_dir = source_dir or os.path.join(os.getcwd(), "source")
+    run_name = os.path.basename(os.path.normpath(run_dir))
+    files = collect_files(run_dir, source_dir if os.path.isdir(source_dir) else None)
+    progress = _Progress(sum(size for _, _, size in files), len(files), on_progress)
+    manifest = {"run": run_name, "created": time.time(), "format": fmt, "files": []}
+
+    temp_path = output_path + ".tmp"
+    try:
+        _write_archive(temp_path, fmt, files, run_name, manifest, progress)
+    except BaseException:
+        # 导出中止时不留下写了一半的归档
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    os.replace(temp_path, output_path)
+    if on_progress:
+        on_progress(progress.done_bytes, progress.total_bytes, progress.done_files, progress.total_files)
+    return manifest
+
+
+def _write_archive(temp_path, fmt, files, run_name, manifest, progress):
+    with open(temp_path, "wb", buffering=BLOCK_SIZE) as output:
+        if fmt == "tar":
+            archive = tarfile.open(fileobj=output, mode="w|", bufsize=BLOCK_SIZE, format=tarfile.PAX_FORMAT)
+        else:
+            archive = zipfile.ZipFile(output, "w", allowZip64=True)
+        try:
+            for path, name, size in files:
+                try:
+                    f = open(path, "rb")
+                except OSError as e:
+                    # 打包前文件已被删除或正在被占用，跳过并在 manifest 中记录
+                    print(f"打包文件失败: {path}: {e}")
+                    manifest.setdefault("skipped", []).append(name)
+                    continue
+                try:
+                    with f:
+                        reader = _HashingReader(f)
+                        if fmt == "tar":
+                            # 以打开后的大小为准；tar 是流式写入，文件头写出后无法回退，
+                            # 读取中途出错或文件变短时只能中止导出，否则归档中间会留下截断的条目
+                            info = tarfile.TarInfo(name)
+                            info.size = size = os.fstat(f.fileno()).st_size
+                            info.mtime = os.path.getmtime(path)
+                            try:
+                                archive.addfile(info, reader)
+                            except OSError as e:
+                                raise IOError(f"打包过程中文件发生变化，导出中止: {path}: {e}")
+                            if reader.size != size:
+                                raise IOError(f"打包过程中文件发生变化，导出中止: {path}")
+                        else:
+                            info = zipfile.ZipInfo.from_file(path, name)
+                            info.compress_type = (zipfile.ZIP_STORED if name.lower().endswith(COMPRESSED_EXTENSIONS)
+                                                  else zipfile.ZIP_DEFLATED)
+                            with archive.open(info, "w") as entry:
+                                while True:
+                                    block = reader.read(BLOCK_SIZE)
+                                    if not block:
+                                        break
+                                    entry.write(block)
+                except OSError as e:
+                    if fmt == "tar":
+                        raise
+                    # zip 条目的大小写在条目之后，读取失败时只影响这一个条目，跳过并在 manifest 中记录
+                    print(f"打包文件失败: {path}: {e}")
+                    manifest.setdefault("skipped", []).append(name)
+                    continue
+                manifest["files"].append({"path": name, "size": reader.size, "sha256": reader.sha256.hexdigest()})
+                progress.update(size)
+
+            extras = [(INDEX_FILE, _index_page(run_name)),
+                      (MANIFEST_FILE, json.dumps(manifest, ensure_ascii=False, indent=1).encode("utf-8"))]
+            for name, data in extras:
+                if fmt == "tar":
+                    info = tarfile.TarInfo(name)
+                    info.size = len(data)
+                    info.mtime = time.time()
+                    archive.addfile(info, io.BytesIO(data))
+                else:
+                    archive.writestr(name, data, compress_type=zipfile.ZIP_DEFLATED)
+        finally:
+            archive.close()
+
+
+def print_progress(done_bytes, total_bytes, done_files, total_files):
+    percent = done_bytes * 100 / total_bytes if total_bytes else 100
+    print(f"导出进度: {percent:5.1f}% ({done_files}/{total_files} 个文件, "
+          f"{done_bytes / 1024 / 1024:.1f}/{total_bytes / 1024 / 1024:.1f} MB)")
+
+
+class ArchiveReader:
+    def __init__(self, path):
+        """ 按路径读取 zip 或 tar 归档中的单个文件，不解压整个归档。"""
+        self.path = path
+        self.lock = threading.Lock()
+        if zipfile.is_zipfile(path):
+            self.zip = zipfile.ZipFile(path)
+            self.tar = None
+            self.names = set(self.zip.namelist())
+        else:
+            self.zip = None
+            # 未压缩的 tar 可以随机访问，建立索引时只读取文件头
+            self.tar = tarfile.open(path, "r:")
+            self.members = {member.name: member for member in self.tar.getmembers() if member.isfile()}
+            self.names = set(self.members)
+
+    def read(self, name):
+        """ 返回归档中 name 的内容，不存在时返回 None。"""
+        if name not in self.names:
+            return None
+        with self.lock:
+            if self.zip is not None:
+                return self.zip.read(name)
+            return self.tar.extractfile(self.members[name]).read()
+
+    def resolve(self, path):
+        """
+        把请求路径映射为归档中的文件。用例报告以绝对路径引用 source 下的静态资源，
+        归档中找不到时按最后一个 /source/ 之后的部分查找。
+        """
+        name = posixpath.normpath(unquote(path)).lstrip("/")
+        if name in ("", "."):
+            name = INDEX_FILE
+        if name in self.names:
+            return name
+        marker = f"/{ARCHIVE_SOURCE_DIR}/"
+        normalized = "/" + name.replace("\\", "/")
+        if marker in normalized:
+            candidate = ARCHIVE_SOURCE_DIR + "/" + normalized.rsplit(marker, 1)[1]
+            if candidate in self.names:
+                return candidate
+        return None
+
+    def close(self):
+        if self.zip is not None:
+            self.zip.close()
+        if self.tar is not None:
+            self.tar.close()
+
+
+def serve_archive(path, host="127.0.0.1", port=0):
+    """
+    在本机启动一个 HTTP 服务，直接从归档中读取页面和截图，返回 (服务, 首页地址)。
+    调用方负责 serve_forever() 和 shutdown()。
+    """
+    reader = ArchiveReader(path)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            name = reader.resolve(urlparse(self.path).path)
+            data = reader.read(name) if name else None
+            if data is None:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", mimetypes.guess_type(name)[0] or "application/octet-stream")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    server.reader = reader
+    return server, f"http://{host}:{server.server_address[1]}/{INDEX_FILE}"
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+# Airtest-Runner/case_utils.py
+
+import os
+import re
+import json
+import tempfile
+import threading
+
+from device_utils import parse_case_requirements
+
+CASE_INDEX_FILE = "case_index.json"
+# 修改索引结构时递增，旧版本的索引会被整体丢弃重建
+CASE_INDEX_VERSION = 2
+DEFAULT_DESCRIPTION = "暂无脚本描述"
+TEMPLATE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+
+
+def _get_mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+class CaseIndex:
+    def __init__(self, case_root=None, index_path=None):
+        """
+        持久化的用例索引，按路径和修改时间缓存每个用例的描述、脚本路径、__requires__ 和模板图片列表。
+        只有目录、脚本或 readme 的修改时间发生变化的用例才会被重新读取，
+        避免在网络共享目录上反复扫描几百个 .air 目录。
+
+        Args:
+            case_root (str): 用例根目录，默认为当前目录下的 case.
+            index_path (str): 索引文件路径，默认为 result/case_index.json.
+        """
+        self.case_root = case_root or os.path.join(os.getcwd(), "case")
+        self.index_path = index_path or os.path.join(os.getcwd(), "result", CASE_INDEX_FILE)
+        self.lock = threading.Lock()
+        self.entries = self._load()
+        self.dirty = False
+
+    def _load(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == CASE_INDEX_VERSION and data.get("case_root") == self.case_root:
+                return data.get("cases", {})
+        except (IOError, ValueError, AttributeError):
+            pass
+        return {}
+
+    def save(self):
+        """ 索引有变化时写回磁盘，先写临时文件再替换。"""
+        with self.lock:
+            if not self.dirty:
+                return
+            snapshot = json.dumps({"version": CASE_INDEX_VERSION, "case_root": self.case_root,
+                                   "cases": self.entries}, ensure_ascii=False, indent=1)
+            self.dirty = False
+        try:
+            directory = os.path.dirname(self.index_path)
+            os.makedirs(directory, exist_ok=True)
+            # 界面和命令行可能同时写同一个索引，每次写入使用不同的临时文件
+            fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(self.index_path) + ".", suffix=".tmp",
+                                            dir=directory)
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    f.write(snapshot)
+                os.replace(tmp_path, self.index_path)
+            except OSError:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                raise
+        except OSError as e:
+            print(f"保存用例索引失败: {e}")
+
+    def _get_paths(self, case):
+        case_dir = os.path.join(self.case_root, case)
+        script_path = os.path.join(case_dir, f"{os.path.splitext(case)[0]}.py")
+        readme_path = os.path.join(case_dir, "readme")
+        return case_dir, script_path, readme_path
+
+    def _get_signature(self, case, dir_mtime=None):
+        """ 目录的修改时间覆盖模板图片的增删，脚本和 readme 的修改时间覆盖内容的变化。"""
+        case_dir, script_path, readme_path = self._get_paths(case)
+        if dir_mtime is None:
+            dir_mtime = _get_mtime(case_dir)
+        return [dir_mtime, _get_mtime(script_path), _get_mtime(readme_path)]
+
+    def _scan(self, case, signature):
+        """ 读取单个用例的脚本、readme 和模板列表。"""
+        case_dir, script_path, readme_path = self._get_paths(case)
+        entry = {"signature": signature, "script": script_path, "brief": "", "readme": "",
+                 "requires": [], "timeout": 0, "templates": []}
+        try:
+            if signature[1] is not None:
+                with open(script_path, "r", encoding="utf-8") as f:
+                    content = f.read()
+                match = re.search(r'\s*__brief__\s*=\s*["\'](.*?)["\']', content)
+                if match:
+                    entry["brief"] = match.group(1).strip()
+                entry["requires"] = parse_case_requirements(content)
+                match = re.search(r'^\s*__timeout__\s*=\s*([0-9.]+)', content, re.M)
+                if match:
+                    entry["timeout"] = float(match.group(1))
+            if signature[2] is not None:
+                with open(readme_path, "r", encoding="utf-8") as f:
+                    entry["readme"] = f.readline().strip()
+            if os.path.isdir(case_dir):
+                entry["templates"] = sorted(name for name in os.listdir(case_dir)
+                                            if name.lower().endswith(TEMPLATE_EXTENSIONS))
+        except Exception as e:
+            print(f"读取用例 {case} 时出错: {e}")
+        return entry
+
+    def _update(self, case, dir_mtime=None):
+        signature = self._get_signature(case, dir_mtime)
+        with self.lock:
+            entry = self.entries.get(case)
+            if entry is not None and entry.get("signature") == signature:
+                return entry
+        entry = self._scan(case, signature)
+        with self.lock:
+            self.entries[case] = entry
+            self.dirty = True
+        return entry
+
+    def refresh(self):
+        """ 增量刷新整个用例目录，返回排序后的用例列表，已删除的用例会从索引中移除。"""
+        if not os.path.isdir(self.case_root):
+            return []
+        # 目录的修改时间直接取自 scandir 的结果，Windows 上不需要额外的文件访问
+        dir_mtimes = {}
+        with os.scandir(self.case_root) as it:
+            for item in it:
+                try:
+                    dir_mtimes[item.name] = item.stat().st_mtime
+                except OSError:
+                    dir_mtimes[item.name] = None
+        with self.lock:
+            for case in set(self.entries) - set(dir_mtimes):
+                del self.entries[case]
+                self.dirty = True
+        for case, dir_mtime in dir_mtimes.items():
+            self._update(case, dir_mtime)
+        self.save()
+        return sorted(dir_mtimes)
+
+    def get(self, case):
+        """ 返回单个用例的索引条目，文件有变化时重新读取。"""
+        entry = self._update(case)
+        self.save()
+        return entry
+
+    def get_brief(self, case):
+        return self.get(case)["brief"] or DEFAULT_DESCRIPTION
+
+    def get_readme(self, case):
+        return self.get(case)["readme"] or DEFAULT_DESCRIPTION
+
+    def get_requires(self, case):
+        return list(self.get(case)["requires"])
+
+    def get_timeout(self, case):
+        """ 脚本中 __timeout__ 声明的总时长预算(秒)，未声明时为 0。"""
+        return self.get(case).get("timeout", 0)
+
+    def get_templates(self, case):
+        return list(self.get(case)["templates"])
+
+
+_case_index = None
+_case_index_lock = threading.Lock()
+
+
+def get_case_index():
+    """ 返回当前项目目录共享的用例索引。"""
+    global _case_index
+    with _case_index_lock:
+        if _case_index is None:
+            _case_index = CaseIndex()
+        return _case_index
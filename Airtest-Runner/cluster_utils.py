@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+# Airtest-Runner/cluster_utils.py
+
+import os
+import json
+import time
+import shutil
+import socket
+import zipfile
+import tempfile
+import threading
+import socketserver
+from collections import deque
+
+# 这些格式本身已经压缩，打包时直接存储
+STORED_EXTENSIONS = {".png", ".jpg", ".jpeg", ".webp", ".gif", ".mp4", ".zip", ".gz"}
+CHUNK_SIZE = 1024 * 1024
+
+
+def parse_address(address, default_host="127.0.0.1"):
+    """ 解析 'host:port' 或 'port' 形式的地址。"""
+    host, _, port = address.rpartition(":")
+    return (host or default_host), int(port)
+
+
+def safe_name(value):
+    """ 把代理上报的名称转换为单级目录名，去掉路径分隔符。"""
+    return str(value).replace("/", "_").replace("\\", "_").replace(":", "_")
+
+
+def pack_dir(src_dir, fileobj):
+    """ 将目录打包为zip写入 fileobj，已压缩的图片等文件直接存储。"""
+    with zipfile.ZipFile(fileobj, "w") as zf:
+        for root, _, files in os.walk(src_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                arcname = os.path.relpath(path, src_dir).replace("\\", "/")
+                ext = os.path.splitext(name)[1].lower()
+                compress = zipfile.ZIP_STORED if ext in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+                zf.write(path, arcname, compress_type=compress)
+
+
+def unpack_dir(fileobj, dest_dir):
+    """ 解压上传的日志包，拒绝指向目标目录之外的条目。"""
+    dest_dir = os.path.abspath(dest_dir)
+    with zipfile.ZipFile(fileobj) as zf:
+        for member in zf.namelist():
+            target = os.path.abspath(os.path.join(dest_dir, member))
+            if os.path.commonpath([dest_dir, target]) != dest_dir:
+                raise ValueError(f"非法的文件路径: {member}")
+        zf.extractall(dest_dir)
+
+
+def _send(wfile, message):
+    wfile.write((json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8"))
+    wfile.flush()
+
+
+def _recv(rfile):
+    line = rfile.readline()
+    if not line:
+        return None
+    return json.loads(line.decode("utf-8"))
+
+
+# =====================================================================================================================
+#  协调端
+# =====================================================================================================================
+class _AgentHandler(socketserver.StreamRequestHandler):
+    """ 每个代理工作线程保持一个连接；连接断开时，其未完成的用例重新入队。"""
+    def handle(self):
+        coordinator = self.server.coordinator
+        outstanding = set()
+        try:
+            while True:
+                message = _recv(self.rfile)
+                if message is None:
+                    break
+                op = message.get("op")
+                if op == "next":
+                    case = coordinator.next_case(message.get("agent", ""))
+                    if case:
+                        outstanding.add(case)
+                    # 队列为空但仍有用例在其他代理上执行时，它们可能因断开而重新入队，代理需稍后重试
+                    _send(self.wfile, {"case": case, "done": coordinator.done.is_set()})
+                elif op == "result":
+                    case = message.get("case")
+                    with tempfile.TemporaryFile() as archive:
+                        remaining = int(message.get("size", 0))
+                        while remaining > 0:
+                            chunk = self.rfile.read(min(CHUNK_SIZE, remaining))
+                            if not chunk:
+                                raise ConnectionError("上传中断")
+                            archive.write(chunk)
+                            remaining -= len(chunk)
+                        archive.seek(0)
+                        # 只接受分发给这个连接且尚未完成的用例，上传内容读完后丢弃，连接仍可继续使用
+                        if case not in outstanding:
+                            print(f"拒绝未分发给该代理的用例结果: {case!r}")
+                            _send(self.wfile, {"ok": False, "error": "unknown case"})
+                            continue
+                        coordinator.submit_result(message, archive)
+                    outstanding.discard(case)
+                    _send(self.wfile, {"ok": True})
+        except (ConnectionError, OSError, ValueError) as e:
+            print(f"代理连接异常: {e}")
+        finally:
+            if outstanding:
+                coordinator.requeue(outstanding)
+
+
+class _ThreadingServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class Coordinator:
+    def __init__(self, cases, log_base_dir, address="127.0.0.1:7788", on_result=None):
+        """
+        多主机分片的协调端：通过 TCP 向各代理分发用例，接收代理上传的日志和状态。
+
+        Args:
+            cases (list): 待分发的用例，按分发顺序排列.
+            log_base_dir (str): 上传的日志解压到 log_base_dir/<case>/<agent_device>.
+            address (str): 监听地址 'host:port'，默认只监听本机，跨主机分发时需显式指定 0.0.0.0.
+            on_result (callable): 每收到一个结果时调用 on_result(result).
+        """
+        self.queue = deque(cases)
+        self.cases = set(cases)
+        self.total = len(cases)
+        self.log_base_dir = log_base_dir
+        self.address = parse_address(address)
+        self.on_result = on_result
+        self.results = []
+        self.finished_cases = set()
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+        self.server = None
+        if not cases:
+            self.done.set()
+
+    @property
+    def port(self):
+        return self.server.server_address[1] if self.server else self.address[1]
+
+    def start(self):
+        """ 在后台线程中开始监听。"""
+        self.server = _ThreadingServer(self.address, _AgentHandler)
+        self.server.coordinator = self
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        print(f"协调端已在 {self.address[0]}:{self.port} 上监听，共 {self.total} 个用例")
+
+    def next_case(self, agent):
+        """ 取出下一个待执行的用例，队列为空时返回 None。"""
+        with self.lock:
+            if not self.queue:
+                return None
+            case = self.queue.popleft()
+        print(f"分发用例 '{case}' -> {agent}")
+        return case
+
+    def requeue(self, cases):
+        """ 将代理断开时仍未完成的用例放回队首。"""
+        with self.lock:
+            for case in cases:
+                if case not in self.finished_cases:
+                    self.queue.appendleft(case)
+                    print(f"用例 '{case}' 的代理已断开，重新入队")
+
+    def submit_result(self, message, archive):
+        """ 解压代理上传的日志目录并记录结果。消息来自网络，只接受本协调端的用例，且目录不能超出 log_base_dir。"""
+        case = message.get("case")
+        if case not in self.cases:
+            raise ValueError(f"未知的用例: {case!r}")
+        dev = f"{safe_name(message.get('agent', 'agent'))}:{safe_name(message.get('dev', 'device'))}"
+        safe_dev = dev.replace(":", "_").replace(".", "_")
+        base_dir = os.path.abspath(self.log_base_dir)
+        log_dir = os.path.abspath(os.path.join(base_dir, safe_name(case), safe_dev))
+        # 日志目录必须正好是 log_base_dir/<用例>/<设备>
+        if os.path.dirname(os.path.dirname(log_dir)) != base_dir:
+            raise ValueError(f"非法的日志目录: {case!r} @ {dev!r}")
+        if os.path.isdir(log_dir):
+            shutil.rmtree(log_dir, ignore_errors=True)
+        os.makedirs(log_dir, exist_ok=True)
+        unpack_dir(archive, log_dir)
+        result = {"case": case, "dev": dev, "status": message.get("status", -1),
+                  "duration": message.get("duration"), "log_dir": log_dir}
+        with self.lock:
+            self.results.append(result)
+            self.finished_cases.add(case)
+            if len(self.finished_cases) >= self.total:
+                self.done.set()
+        if self.on_result:
+            self.on_result(result)
+
+    def wait(self, timeout=None):
+        """ 等待所有用例都收到结果。"""
+        return self.done.wait(timeout)
+
+    def shutdown(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+# =====================================================================================================================
+#  代理端
+# =====================================================================================================================
+class AgentClient:
+    def __init__(self, address, name=None, timeout=300):
+        """
+        代理端连接，从协调端拉取用例并上传执行结果。
+
+        Args:
+            address (str): 协调端地址 'host:port'.
+            name (str): 代理名称，默认为 主机名-进程号，保证同一台机器上的多个代理互不冲突.
+            timeout (float): 网络操作超时(秒).
+        """
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}"
+        self.sock = socket.create_connection(parse_address(address), timeout=timeout)
+        self.rfile = self.sock.makefile("rb")
+        self.wfile = self.sock.makefile("wb")
+
+    def next_case(self, retry_interval=2):
+        """ 拉取下一个用例，所有用例都已完成时返回 None。"""
+        while True:
+            _send(self.wfile, {"op": "next", "agent": self.name})
+            reply = _recv(self.rfile)
+            if not reply:
+                return None
+            if reply.get("case") or reply.get("done"):
+                return reply.get("case")
+            time.sleep(retry_interval)
+
+    def upload(self, case, dev, status, log_dir, duration=None):
+        """ 打包并上传单个用例的日志目录和状态。"""
+        with tempfile.TemporaryFile() as archive:
+            pack_dir(log_dir, archive)
+            size = archive.tell()
+            archive.seek(0)
+            _send(self.wfile, {"op": "result", "agent": self.name, "case": case, "dev": dev,
+                               "status": status, "duration": duration, "size": size})
+            shutil.copyfileobj(archive, self.wfile, CHUNK_SIZE)
+            self.wfile.flush()
+        return _recv(self.rfile)
+
+    def close(self):
+        for f in (self.rfile, self.wfile):
+            try:
+                f.close()
+            except OSError:
+                pass
+        self.sock.close()
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+# Airtest-Runner/device_utils.py
+
+import os
+import re
+import json
+import threading
+
+# 子进程通过该环境变量拿到租用设备的配置，WebChrome 会用它覆盖 setting.json 中的同名字段
+DEVICE_ENV_KEY = "AIRTEST_DEVICE"
+DEFAULT_DEVICE_NAME = "web_device"
+DEVICE_KEYS = ("serial_port", "wired_adapter", "wireless_adapter", "adapter_support_6g")
+
+
+class Device:
+    def __init__(self, name, serial_port="", wired_adapter="", wireless_adapter="",
+                 adapter_support_6g=False, tags=None, slots=1):
+        """
+        描述一台被测设备(DUT)及其所连接的串口和网卡。
+
+        Args:
+            name (str): 设备名称，同时用作日志目录和报告中的列名.
+            serial_port (str): 设备使用的串口.
+            wired_adapter (str): 设备使用的有线网卡.
+            wireless_adapter (str): 设备使用的无线网卡.
+            adapter_support_6g (bool): 无线网卡是否支持6G.
+            tags (list): 额外的能力标签，用于匹配用例的 __requires__.
+            slots (int): 设备可同时承载的用例数量.
+        """
+        self.name = name
+        self.serial_port = serial_port or ""
+        self.wired_adapter = wired_adapter or ""
+        self.wireless_adapter = wireless_adapter or ""
+        self.adapter_support_6g = bool(adapter_support_6g)
+        self.slots = max(1, int(slots or 1))
+        self.leased = 0
+        self.tags = set(tags or [])
+        # 根据已配置的硬件自动补充能力标签
+        if self.serial_port:
+            self.tags.add("serial")
+        if self.wired_adapter:
+            self.tags.add("wired")
+        if self.wireless_adapter:
+            self.tags.add("wireless")
+            if self.adapter_support_6g:
+                self.tags.add("6g")
+
+    @classmethod
+    def from_dict(cls, data, default_name=DEFAULT_DEVICE_NAME):
+        """ 从 setting.json 中的一条设备声明构建设备对象。"""
+        return cls(
+            name=data.get("name") or default_name,
+            serial_port=data.get("serial_port", ""),
+            wired_adapter=data.get("wired_adapter", ""),
+            wireless_adapter=data.get("wireless_adapter", ""),
+            adapter_support_6g=data.get("adapter_support_6g", False),
+            tags=data.get("tags", []),
+            slots=data.get("slots", 1),
+        )
+
+    def is_compatible(self, requires):
+        """ 判断设备是否具备用例要求的全部能力标签。"""
+        return set(requires or []) <= self.tags
+
+    def to_settings(self):
+        """ 返回可直接覆盖 setting.json 同名字段的设备配置。"""
+        data = {key: getattr(self, key) for key in DEVICE_KEYS}
+        data["device_name"] = self.name
+        return data
+
+    def to_env(self, env=None):
+        """ 将设备配置写入子进程环境变量。"""
+        env = dict(env if env is not None else os.environ)
+        env[DEVICE_ENV_KEY] = json.dumps(self.to_settings(), ensure_ascii=False)
+        return env
+
+    def __repr__(self):
+        return f"Device({self.name!r}, tags={sorted(self.tags)})"
+
+
+class DeviceRegistry:
+    def __init__(self, devices):
+        """
+        设备注册表与租约调度器。用例执行前通过 lease() 租用一台空闲且能力匹配的设备，
+        执行结束后通过 release() 归还，从而让所有测试台同时保持忙碌。
+        """
+        if not devices:
+            raise ValueError("设备注册表中至少需要一台设备")
+        names = [dev.name for dev in devices]
+        if len(set(names)) != len(names):
+            raise ValueError(f"设备名称重复: {names}")
+        self.devices = list(devices)
+        self.condition = threading.Condition()
+
+    @classmethod
+    def from_settings(cls, settings, default_slots=1):
+        """
+        根据设置构建注册表。
+        如果 setting.json 中声明了 devices 列表，则每一项对应一台设备；
+        否则使用主界面上的串口/网卡配置作为唯一的默认设备，其可并发数为 default_slots。
+        """
+        declared = settings.get("devices") or []
+        if declared:
+            devices = [Device.from_dict(item, default_name=f"device_{i + 1}")
+                       for i, item in enumerate(declared)]
+        else:
+            data = {key: settings.get(key, "") for key in DEVICE_KEYS}
+            data["slots"] = default_slots
+            devices = [Device.from_dict(data)]
+        return cls(devices)
+
+    @property
+    def capacity(self):
+        """ 所有设备可同时承载的用例总数。"""
+        return sum(dev.slots for dev in self.devices)
+
+    def is_satisfiable(self, requires):
+        """ 判断注册表中是否存在能满足要求的设备。"""
+        return any(dev.is_compatible(requires) for dev in self.devices)
+
+    def lease(self, requires=None, should_continue=None, poll_interval=0.5):
+        """
+        阻塞直到租到一台空闲且满足 requires 的设备。
+        当 should_continue() 返回 False 或没有任何设备能满足要求时返回 None。
+        """
+        if not self.is_satisfiable(requires):
+            return None
+        with self.condition:
+            while True:
+                if should_continue is not None and not should_continue():
+                    return None
+                for dev in self.devices:
+                    if dev.leased < dev.slots and dev.is_compatible(requires):
+                        dev.leased += 1
+                        return dev
+                self.condition.wait(timeout=poll_interval)
+
+    def release(self, device):
+        """ 归还设备并唤醒等待中的用例。"""
+        with self.condition:
+            device.leased = max(0, device.leased - 1)
+            self.condition.notify_all()
+
+
+def parse_case_requirements(content):
+    """ 从脚本内容中解析 __requires__ 声明。"""
+    match = re.search(r'^\s*__requires__\s*=\s*[\[\(](.*?)[\]\)]', content, re.S | re.M)
+    if match:
+        return re.findall(r'["\'](.*?)["\']', match.group(1))
+    return []
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+# Airtest-Runner/event_utils.py
+
+import os
+import json
+import time
+import threading
+
+EVENTS_FILE = "events.jsonl"
+# 记录正在进行的运行，外部看板据此找到需要跟踪的事件文件
+CURRENT_FILE = "current.json"
+
+
+class EventStream:
+    def __init__(self, run_dir, result_root=None):
+        """
+        运行事件流：以 JSON Lines 的形式把运行过程追加到运行目录下的 events.jsonl，
+        外部看板和界面只需跟踪文件末尾即可获得进度，不再需要解析标准输出。
+        每个事件一行，包含 seq(序号)、ts(时间戳)、event(事件类型) 和事件自身的字段。
+
+        Args:
+            run_dir (str): 本次运行的目录.
+            result_root (str): 报告根目录，提供时在其中写入 current.json 指向本次运行.
+        """
+        self.path = os.path.join(run_dir, EVENTS_FILE)
+        self.seq = 0
+        self.lock = threading.Lock()
+        self.listeners = []
+        self.file = open(self.path, "a", encoding="utf-8")
+        if result_root:
+            try:
+                with open(os.path.join(result_root, CURRENT_FILE), "w", encoding="utf-8") as f:
+                    json.dump({"run": os.path.relpath(run_dir, result_root).replace('\\', '/'),
+                               "events": os.path.relpath(self.path, result_root).replace('\\', '/'),
+                               "time": time.time()}, f, ensure_ascii=False)
+            except OSError as e:
+                print(f"写入 {CURRENT_FILE} 失败: {e}")
+
+    def add_listener(self, callback):
+        """ 注册监听函数，每个事件写入后以事件字典调用 callback(record)。"""
+        self.listeners.append(callback)
+
+    def emit(self, event, **fields):
+        """ 追加一个事件。每个事件单独写入并刷新，读取方总能看到完整的行。"""
+        with self.lock:
+            if self.file is None:
+                return
+            self.seq += 1
+            record = {"seq": self.seq, "ts": round(time.time(), 3), "event": event}
+            record.update(fields)
+            try:
+                self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+                self.file.flush()
+            except (OSError, ValueError) as e:
+                print(f"写入运行事件失败: {e}")
+            for callback in self.listeners:
+                try:
+                    callback(record)
+                except Exception as e:
+                    print(f"处理运行事件失败: {e}")
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+
+def tail_events(path, offset=0):
+    """
+    从 offset 开始读取新增的完整事件，返回 (事件列表, 新的 offset)。
+    尚未写完的最后一行留到下次读取。
+    """
+    try:
+        with open(path, "rb") as f:
+            f.seek(offset)
+            data = f.read()
+    except IOError:
+        return [], offset
+    end = data.rfind(b"\n") + 1
+    events = []
+    for line in data[:end].splitlines():
+        try:
+            events.append(json.loads(line.decode("utf-8")))
+        except ValueError:
+            continue
+    return events, offset + end
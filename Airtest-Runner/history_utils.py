@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+# Airtest-Runner/history_utils.py
+
+import os
+import json
+import heapq
+import tempfile
+import threading
+from contextlib import contextmanager
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+HISTORY_FILE = "history.json"
+# 每个用例保留的最近耗时样本数
+MAX_SAMPLES = 10
+# 没有任何历史数据时对单个用例耗时的估计(秒)
+DEFAULT_ESTIMATE = 60.0
+
+
+@contextmanager
+def file_lock(path):
+    """ 跨进程的排他锁，锁定 path 对应的锁文件，用于多个运行同时更新同一份记录。"""
+    with open(path, "a+b") as f:
+        if os.name == 'nt':
+            # msvcrt 只锁定字节区间，LK_LOCK 重试约 10 秒后抛出 OSError，此时继续等待
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class TimingStore:
+    def __init__(self, result_root, filename=HISTORY_FILE):
+        """
+        持久化的用例耗时记录，保存在 result 目录下，不随单次运行目录被清理。
+
+        Args:
+            result_root (str): 报告根目录.
+            filename (str): 记录文件名.
+        """
+        self.path = os.path.join(result_root, filename)
+        self.lock = threading.Lock()
+        self.data = self._load()
+        # 本进程尚未写入文件的记录 {用例: {'durations', 'runs', 'status'}}
+        self.pending = {}
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (IOError, ValueError):
+            return {}
+
+    def save(self):
+        """
+        在跨进程锁内重新读取记录文件，合并本进程尚未写入的记录后再写回，
+        多个运行(命令行、界面、代理)同时执行时不会丢失彼此的耗时。
+        先写临时文件再替换，避免运行中断时留下损坏的记录。
+        """
+        with self.lock:
+            directory = os.path.dirname(self.path)
+            os.makedirs(directory, exist_ok=True)
+            with file_lock(self.path + ".lock"):
+                data = self._load()
+                for case, pending in self.pending.items():
+                    entry = data.setdefault(case, {"durations": [], "runs": 0})
+                    entry["durations"] = (entry.get("durations", []) + pending["durations"])[-MAX_SAMPLES:]
+                    entry["status"] = pending["status"]
+                    entry["runs"] = entry.get("runs", 0) + pending["runs"]
+                snapshot = json.dumps(data, ensure_ascii=False, indent=1)
+                fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(self.path) + ".", suffix=".tmp",
+                                                dir=directory)
+                try:
+                    with os.fdopen(fd, "w", encoding="utf-8") as f:
+                        f.write(snapshot)
+                    os.replace(tmp_path, self.path)
+                except OSError:
+                    try:
+                        os.remove(tmp_path)
+                    except OSError:
+                        pass
+                    raise
+            self.data = data
+            self.pending = {}
+
+    def record(self, case, duration, status):
+        """ 记录一次用例执行的耗时和结果，并立即落盘。"""
+        with self.lock:
+            entry = self.data.setdefault(case, {"durations": [], "runs": 0})
+            entry["durations"] = (entry.get("durations", []) + [round(duration, 3)])[-MAX_SAMPLES:]
+            entry["status"] = status
+            entry["runs"] = entry.get("runs", 0) + 1
+            pending = self.pending.setdefault(case, {"durations": [], "runs": 0})
+            pending["durations"] = (pending["durations"] + [round(duration, 3)])[-MAX_SAMPLES:]
+            pending["status"] = status
+            pending["runs"] += 1
+        try:
+            self.save()
+        except OSError as e:
+            print(f"保存用例耗时记录失败: {e}")
+
+    def get_last_status(self, case):
+        """ 返回用例最近一次的执行结果，没有记录时返回 None。"""
+        with self.lock:
+            return self.data.get(case, {}).get("status")
+
+    def estimate(self, case):
+        """
+        估计用例耗时：取最近样本的平均值；没有记录的用例使用所有已知用例的中位数，
+        完全没有历史时使用 DEFAULT_ESTIMATE。
+        """
+        with self.lock:
+            durations = self.data.get(case, {}).get("durations")
+            if durations:
+                return sum(durations) / len(durations)
+            known = sorted(sum(v["durations"]) / len(v["durations"])
+                           for v in self.data.values() if v.get("durations"))
+        if known:
+            return known[len(known) // 2]
+        return DEFAULT_ESTIMATE
+
+    def order_longest_first(self, cases):
+        """ 按估计耗时从长到短排序(LPT)，让长用例尽早开始以缩短整体完成时间。"""
+        estimates = {case: self.estimate(case) for case in cases}
+        return sorted(cases, key=lambda case: (-estimates[case], case))
+
+    def shard(self, cases, count):
+        """
+        把用例按 LPT 贪心算法分成 count 个估计耗时尽量均衡的分片。
+        每个分片内部同样按从长到短排列。
+        """
+        count = max(1, int(count))
+        shards = [[] for _ in range(count)]
+        heap = [(0.0, i) for i in range(count)]
+        for case in self.order_longest_first(cases):
+            load, i = heapq.heappop(heap)
+            shards[i].append(case)
+            heapq.heappush(heap, (load + self.estimate(case), i))
+        return shards
+
+    def eta(self, pending_cases, running_cases, workers, now):
+        """
+        根据历史耗时估计剩余时间(秒)。
+
+        Args:
+            pending_cases (iterable): 尚未开始的用例.
+            running_cases (dict): 正在执行的用例及其开始时间.
+            workers (int): 并发执行的数量.
+            now (float): 当前时间戳.
+        """
+        remaining = sum(self.estimate(case) for case in pending_cases)
+        remaining += sum(max(0.0, self.estimate(case) - (now - start))
+                         for case, start in running_cases.items())
+        return remaining / max(1, workers)
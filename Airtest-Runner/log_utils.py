@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+# Airtest-Runner/log_utils.py
+
+import os
+import time
+import bisect
+import threading
+from collections import deque
+
+# 每个用例保留的实时日志行数
+DEFAULT_MAX_LINES = 2000
+# 两次刷新之间最多暂存的行数，超出时丢弃最旧的行并计数
+DEFAULT_MAX_PENDING = 5000
+# 界面从缓冲区取日志的间隔(毫秒)
+LOG_FLUSH_INTERVAL = 100
+# “全部”视图使用的键
+ALL_CASES = ""
+
+
+def format_line(case, line):
+    """ “全部”视图中每行前面加上用例名。"""
+    return f"[{case}] {line}" if case else line
+
+
+class LogBuffer:
+    def __init__(self, max_lines=DEFAULT_MAX_LINES, max_pending=DEFAULT_MAX_PENDING):
+        """
+        实时日志的环形缓冲区。读取子进程输出的线程只向这里追加，
+        界面按固定频率调用 drain() 批量取走新增的行，不再为每一行发送一次信号。
+
+        Args:
+            max_lines (int): 每个用例(以及“全部”视图)保留的最近行数.
+            max_pending (int): 两次 drain 之间最多暂存的行数.
+        """
+        self.max_lines = max(1, int(max_lines or DEFAULT_MAX_LINES))
+        self.lines = {ALL_CASES: deque(maxlen=self.max_lines)}
+        self.pending = deque(maxlen=max(1, int(max_pending or DEFAULT_MAX_PENDING)))
+        self.dropped = 0
+        self.lock = threading.Lock()
+
+    def append(self, case, line):
+        """ 追加一行日志，可在任意线程中调用。"""
+        line = line.rstrip("\r\n")
+        with self.lock:
+            if case != ALL_CASES:
+                if case not in self.lines:
+                    self.lines[case] = deque(maxlen=self.max_lines)
+                self.lines[case].append(line)
+            self.lines[ALL_CASES].append(format_line(case, line))
+            if len(self.pending) == self.pending.maxlen:
+                self.dropped += 1
+            self.pending.append((case, line))
+
+    def drain(self):
+        """ 取走上次调用以来新增的行，返回 ([(case, line), ...], 因积压被丢弃的行数)。"""
+        with self.lock:
+            batch = list(self.pending)
+            self.pending.clear()
+            dropped, self.dropped = self.dropped, 0
+        return batch, dropped
+
+    def get_lines(self, case=ALL_CASES):
+        """ 返回某个用例当前保留的全部行。"""
+        with self.lock:
+            return list(self.lines.get(case, ()))
+
+    def get_cases(self):
+        """ 按首次出现的顺序返回产生过日志的用例。"""
+        with self.lock:
+            return [case for case in self.lines if case != ALL_CASES]
+
+
+# =====================================================================================================================
+#  用例控制台输出落盘
+# =====================================================================================================================
+CONSOLE_FILE = "console.log"
+CONSOLE_INDEX_FILE = "console.idx"
+# 每隔多少秒在索引中记录一次 (时间戳, 文件偏移)
+CONSOLE_INDEX_INTERVAL = 1.0
+CONSOLE_BUFFER_SIZE = 64 * 1024
+# 界面日志面板可选的时间窗口(秒)，0 表示实时缓冲区
+CONSOLE_WINDOWS = ((0, "实时"), (300, "最近 5 分钟"), (1800, "最近 30 分钟"), (7200, "最近 2 小时"))
+
+
+class ConsoleWriter:
+    def __init__(self, log_dir, index_interval=CONSOLE_INDEX_INTERVAL):
+        """
+        把单个用例的控制台输出写入日志目录下的 console.log，并在 console.idx 中按时间记录文件偏移。
+        写入经过缓冲，只在记录索引时刷新一次，长时间运行的用例也不会因逐行写盘拖慢输出读取。
+
+        Args:
+            log_dir (str): 用例的日志目录(与 log.txt 相同).
+            index_interval (float): 记录索引的间隔(秒).
+        """
+        self.path = os.path.join(log_dir, CONSOLE_FILE)
+        self.index_path = os.path.join(log_dir, CONSOLE_INDEX_FILE)
+        self.index_interval = index_interval
+        self.file = open(self.path, "ab", buffering=CONSOLE_BUFFER_SIZE)
+        self.index_file = open(self.index_path, "a", encoding="utf-8")
+        self.offset = self.file.tell()
+        self.last_index_time = None
+        # 最近一次写入的时间，看门狗据此判断用例是否仍有输出
+        self.last_write = None
+        self.lock = threading.Lock()
+
+    def write(self, line, now=None):
+        """ 写入一行输出，可在任意线程中调用；关闭后的写入会被忽略。"""
+        data = (line.rstrip("\r\n") + "\n").encode("utf-8")
+        now = time.time() if now is None else now
+        with self.lock:
+            if self.file is None:
+                return
+            if self.last_index_time is None or now - self.last_index_time >= self.index_interval:
+                # 索引指向的内容必须已经在文件中，先刷新缓冲再记录
+                self.file.flush()
+                self.index_file.write(f"{now:.3f}\t{self.offset}\n")
+                self.index_file.flush()
+                self.last_index_time = now
+            self.file.write(data)
+            self.offset += len(data)
+            self.last_write = now
+
+    def close(self):
+        with self.lock:
+            if self.file is None:
+                return
+            self.file.close()
+            self.index_file.close()
+            self.file = None
+            self.index_file = None
+
+
+def start_console_reader(stream, console, on_line=None):
+    """
+    在后台线程中逐行读取子进程输出，写入 console 并交给 on_line，读到结尾时关闭 console。
+    返回该线程，调用方在子进程结束后 join 以确保输出全部落盘。
+    """
+    def reader():
+        try:
+            for line in iter(stream.readline, ''):
+                line = line.rstrip("\r\n")
+                console.write(line)
+                if on_line is not None:
+                    on_line(line)
+        finally:
+            stream.close()
+            console.close()
+
+    thread = threading.Thread(target=reader, daemon=True)
+    thread.start()
+    return thread
+
+
+def finish_console(console, reader=None, timeout=5):
+    """ 子进程结束后等待读取线程取完剩余的输出，再关闭 console。"""
+    if reader is not None:
+        reader.join(timeout)
+    console.close()
+
+
+def load_console_index(log_dir):
+    """ 读取 console.idx，返回按时间排序的 [(时间戳, 偏移), ...]。"""
+    entries = []
+    try:
+        with open(os.path.join(log_dir, CONSOLE_INDEX_FILE), "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    timestamp, offset = line.split("\t")
+                    entries.append((float(timestamp), int(offset)))
+                except ValueError:
+                    continue
+    except IOError:
+        pass
+    return entries
+
+
+def read_console(log_dir, start=None, end=None, index=None):
+    """
+    按时间窗口读取 console.log，只读取 [start, end] 覆盖的部分而不加载整个文件。
+    窗口边界以索引间隔为粒度向外取整。
+
+    Args:
+        log_dir (str): 用例的日志目录.
+        start (float): 起始时间戳，None 表示从头开始.
+        end (float): 结束时间戳，None 表示读到结尾.
+        index (list): 已经读取的索引，避免重复读取 console.idx.
+
+    Returns:
+        list: 窗口内的输出行.
+    """
+    index = load_console_index(log_dir) if index is None else index
+    timestamps = [timestamp for timestamp, _ in index]
+    begin_offset = 0
+    end_offset = None
+    if start is not None and index:
+        # 最后一个不晚于 start 的索引点
+        position = bisect.bisect_right(timestamps, start) - 1
+        begin_offset = index[max(0, position)][1]
+    if end is not None and index:
+        # 第一个晚于 end 的索引点
+        position = bisect.bisect_right(timestamps, end)
+        if position < len(index):
+            end_offset = index[position][1]
+    try:
+        with open(os.path.join(log_dir, CONSOLE_FILE), "rb") as f:
+            f.seek(begin_offset)
+            data = f.read() if end_offset is None else f.read(max(0, end_offset - begin_offset))
+    except IOError:
+        return []
+    return data.decode("utf-8", errors="replace").splitlines()
@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+# Airtest-Runner/metrics_utils.py
+
+import os
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import psutil
+
+# 用例耗时直方图的桶上限(秒)
+DURATION_BUCKETS = (5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600)
+# 文本文件导出的默认间隔(秒)
+DEFAULT_INTERVAL = 15.0
+DEFAULT_HOST = "127.0.0.1"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(**labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _result_of(record):
+    """ 把 case_finished 事件归类为 passed / failed / timeout / no_device。"""
+    if record.get("reason") == "no_device":
+        return "no_device"
+    if record.get("reason") in ("timeout", "idle") or record.get("status") == -2:
+        return "timeout"
+    return "passed" if record.get("status") == 0 else "failed"
+
+
+class RunMetrics:
+    def __init__(self):
+        """
+        运行指标：订阅 EventStream 的事件累计计数，抓取时再采样各用例进程的内存，
+        以 Prometheus 文本格式输出，供本地的 Prometheus/Grafana 观察夜间无人值守的运行。
+        """
+        self.lock = threading.Lock()
+        self.run_start = 0
+        self.cases_total = 0
+        self.workers = 0
+        self.queued = set()
+        self.active = {}
+        self.completed = 0
+        self.results = {}
+        self.reports = {}
+        # {case: [各桶计数, 总和, 总数]}
+        self.durations = {}
+
+    def on_event(self, record):
+        """ EventStream 的监听函数，根据事件更新计数。"""
+        event = record.get("event")
+        with self.lock:
+            if event == "run_started":
+                self.run_start = record.get("ts", time.time())
+                self.cases_total = record.get("cases", 0)
+                self.workers = record.get("workers", 0)
+            elif event == "case_queued":
+                self.queued.add(record.get("case"))
+            elif event == "case_started":
+                self.queued.discard(record.get("case"))
+                key = (record.get("case"), record.get("device"))
+                self.active[key] = self.active.get(key, 0) + 1
+            elif event == "case_finished":
+                case = record.get("case")
+                self.queued.discard(case)
+                key = (case, record.get("device"))
+                if self.active.get(key):
+                    self.active[key] -= 1
+                    if not self.active[key]:
+                        del self.active[key]
+                self.completed += 1
+                result = _result_of(record)
+                self.results[result] = self.results.get(result, 0) + 1
+                if result != "no_device":
+                    self._observe(case, float(record.get("duration") or 0))
+            elif event == "report_rendered":
+                ok = "true" if record.get("ok") else "false"
+                self.reports[ok] = self.reports.get(ok, 0) + 1
+
+    def _observe(self, case, duration):
+        buckets, total, count = self.durations.get(case) or ([0] * len(DURATION_BUCKETS), 0.0, 0)
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if duration <= bound:
+                buckets[i] += 1
+        self.durations[case] = [buckets, total + duration, count + 1]
+
+    def sample_workers(self):
+        """
+        采样当前进程的每个子进程(用例进程、预热进程、报告进程)及其子孙进程(驱动、浏览器)的常驻内存，
+        返回 [(pid, 名称, RSS 字节数)]。
+        """
+        workers = []
+        try:
+            children = psutil.Process().children()
+        except psutil.Error:
+            return workers
+        for child in children:
+            try:
+                rss = child.memory_info().rss
+                name = child.name()
+                for process in child.children(recursive=True):
+                    try:
+                        rss += process.memory_info().rss
+                    except psutil.Error:
+                        pass
+            except psutil.Error:
+                continue
+            workers.append((child.pid, name, rss))
+        return workers
+
+    def render(self):
+        """ 以 Prometheus 文本格式输出当前的全部指标。"""
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{labels} {value}")
+
+        workers = self.sample_workers()
+        try:
+            runner_rss = psutil.Process().memory_info().rss
+        except psutil.Error:
+            runner_rss = 0
+
+        with self.lock:
+            metric("airtest_run_start_time_seconds", "gauge", "本次运行的开始时间", [("", self.run_start)])
+            metric("airtest_cases", "gauge", "本次运行的用例总数", [("", self.cases_total)])
+            metric("airtest_cases_queued", "gauge", "排队中尚未开始的用例数", [("", len(self.queued))])
+            metric("airtest_workers", "gauge", "最大并发数", [("", self.workers)])
+            metric("airtest_workers_active", "gauge", "正在执行的用例数", [("", sum(self.active.values()))])
+            metric("airtest_cases_completed_total", "counter", "已完成的用例数", [("", self.completed)])
+            metric("airtest_case_results_total", "counter", "按结果分类的用例数",
+                   [(_labels(result=result), self.results.get(result, 0))
+                    for result in ("passed", "failed", "timeout", "no_device")])
+            metric("airtest_reports_rendered_total", "counter", "已生成的用例报告数",
+                   [(_labels(ok=ok), self.reports.get(ok, 0)) for ok in ("true", "false")])
+
+            lines.append("# HELP airtest_case_duration_seconds 用例执行耗时")
+            lines.append("# TYPE airtest_case_duration_seconds histogram")
+            for case in sorted(self.durations):
+                buckets, total, count = self.durations[case]
+                for bound, value in zip(DURATION_BUCKETS, buckets):
+                    lines.append(f"airtest_case_duration_seconds_bucket{_labels(case=case, le=bound)} {value}")
+                lines.append(f"airtest_case_duration_seconds_bucket{_labels(case=case, le='+Inf')} {count}")
+                lines.append(f"airtest_case_duration_seconds_sum{_labels(case=case)} {total:.3f}")
+                lines.append(f"airtest_case_duration_seconds_count{_labels(case=case)} {count}")
+
+        metric("airtest_runner_rss_bytes", "gauge", "执行器进程的常驻内存", [("", runner_rss)])
+        metric("airtest_worker_rss_bytes", "gauge", "每个工作进程(含驱动和浏览器)的常驻内存",
+               [(_labels(pid=pid, name=name), rss) for pid, name, rss in workers])
+        return "\n".join(lines) + "\n"
+
+
+class MetricsExporter:
+    def __init__(self, metrics, port=0, host=DEFAULT_HOST, textfile=None, interval=DEFAULT_INTERVAL):
+        """
+        导出运行指标：port 大于 0 时在本机提供 HTTP /metrics 供 Prometheus 抓取，
+        提供 textfile 时按 interval 秒把指标写入该文件(供 node_exporter 的 textfile 采集器读取)。
+
+        Args:
+            metrics (RunMetrics): 指标数据.
+            port (int): HTTP 端口，0 表示不启用.
+            host (str): HTTP 监听地址，默认只监听本机.
+            textfile (str): 文本文件路径，建议以 .prom 结尾.
+            interval (float): 写入文本文件的间隔(秒).
+        """
+        self.metrics = metrics
+        self.port = int(port or 0)
+        self.host = host or DEFAULT_HOST
+        self.textfile = textfile
+        self.interval = max(1.0, float(interval or DEFAULT_INTERVAL))
+        self.server = None
+        self.writer = None
+        self.stopped = threading.Event()
+
+    @classmethod
+    def from_settings(cls, settings, metrics):
+        """ 从 setting.json 的 metrics_port / metrics_host / metrics_textfile / metrics_interval 创建，都未配置时返回 None。"""
+        if not settings.get("metrics_port") and not settings.get("metrics_textfile"):
+            return None
+        return cls(
+            metrics,
+            port=settings.get("metrics_port", 0),
+            host=settings.get("metrics_host", DEFAULT_HOST),
+            textfile=settings.get("metrics_textfile") or None,
+            interval=settings.get("metrics_interval", DEFAULT_INTERVAL),
+        )
+
+    def start(self):
+        if self.port:
+            metrics = self.metrics
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.split("?")[0] not in ("/", "/metrics"):
+                        self.send_error(404)
+                        return
+                    body = metrics.render().encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", CONTENT_TYPE)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, *args):
+                    pass
+
+            try:
+                self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+                self.server.daemon_threads = True
+                threading.Thread(target=self.server.serve_forever, daemon=True).start()
+                print(f"运行指标: http://{self.host}:{self.server.server_address[1]}/metrics")
+            except OSError as e:
+                print(f"启动指标服务失败: {e}")
+                self.server = None
+        if self.textfile:
+            self.writer = threading.Thread(target=self._write_loop, daemon=True)
+            self.writer.start()
+        return self
+
+    def write_textfile(self):
+        """ 先写入临时文件再替换，采集器不会读到写了一半的内容。"""
+        temp_path = self.textfile + ".tmp"
+        try:
+            directory = os.path.dirname(self.textfile)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(temp_path, "w", encoding="utf-8") as f:
+                f.write(self.metrics.render())
+            os.replace(temp_path, self.textfile)
+        except OSError as e:
+            print(f"写入指标文件失败: {e}")
+
+    def _write_loop(self):
+        while not self.stopped.wait(self.interval):
+            self.write_textfile()
+
+    def stop(self):
+        """ 停止导出，文本文件最后再写一次以保留运行结束时的计数。"""
+        self.stopped.set()
+        if self.writer is not None:
+            self.writer.join(timeout=self.interval)
+            self.write_textfile()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+def start_metrics(settings, events):
+    """ 按 setting.json 的配置订阅事件流并启动导出，未配置时返回 None。"""
+    metrics = RunMetrics()
+    exporter = MetricsExporter.from_settings(settings, metrics)
+    if exporter is None:
+        return None
+    events.add_listener(metrics.on_event)
+    return exporter.start()
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+# Airtest-Runner/report_utils.py
+
+import os
+import time
+import traceback
+import threading
+import subprocess
+from concurrent.futures import ProcessPoolExecutor, CancelledError, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+REPORT_PLUGIN = "tp_airtest_selenium.report"
+REPORT_TIMEOUT = 60
+
+
+def _init_report_worker(project_root):
+    """
+    报告进程的初始化函数：只在进程启动时导入一次 airtest 并应用报告插件补丁，
+    之后该进程生成的每一份报告都不再重复付出解释器启动和导入的开销。
+    """
+    os.environ["PROJECT_ROOT"] = project_root
+    from airtest.core.settings import Settings as ST
+    ST.PROJECT_ROOT = project_root
+    import tp_airtest_selenium.report  # noqa: F401 导入即完成 LogToHtml 的补丁
+
+
+def render_report(case_path, log_dir, report_path, static_root, lang="zh"):
+    """
+    在当前进程中直接调用 LogToHtml 生成单个用例的报告，等价于 `airtest report` 命令。
+    """
+    from airtest.report.report import LogToHtml, HTML_TPL
+    from airtest.utils.compat import script_dir_name
+
+    start = time.time()
+    script_root, script_name = script_dir_name(case_path)
+    rpt = LogToHtml(script_root, log_dir, static_root, script_name=script_name,
+                    lang=lang, plugins=[REPORT_PLUGIN])
+    rpt.report(HTML_TPL, output_file=report_path)
+    return time.time() - start
+
+
+def render_report_cli(case_path, log_dir, report_path, static_root, lang="zh"):
+    """
+    通过 `airtest report` 子进程生成报告，在无法使用进程池时作为后备方案。
+    """
+    start = time.time()
+    cmd = [
+        "airtest", "report", case_path,
+        "--log_root", log_dir,
+        "--outfile", report_path,
+        "--static_root", static_root,
+        "--lang", lang,
+        "--plugin", REPORT_PLUGIN
+    ]
+    is_windows = (os.name == 'nt')
+    report_process = subprocess.Popen(
+        cmd,
+        shell=is_windows,
+        cwd=os.getcwd(),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE
+    )
+    report_process.communicate(timeout=REPORT_TIMEOUT)
+    return time.time() - start
+
+
+class ReportRenderer:
+    def __init__(self, workers=1, project_root=None):
+        """
+        常驻的报告渲染进程池。
+
+        Args:
+            workers (int): 报告进程数量.
+            project_root (str): 项目根目录，报告插件会在其下的 source 目录中寻找模板.
+        """
+        self.workers = max(1, int(workers or 1))
+        self.project_root = project_root or os.getcwd()
+        self.pool = None
+        self.use_cli = False
+        self.lock = threading.Lock()
+
+    def _get_pool(self):
+        """ 延迟创建进程池，多个报告线程共享同一个池。"""
+        with self.lock:
+            if self.pool is None:
+                self.pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    initializer=_init_report_worker,
+                    initargs=(self.project_root,)
+                )
+            return self.pool
+
+    def render(self, case_path, log_dir, report_path, static_root=None, lang="zh"):
+        """
+        生成单个用例的报告，返回渲染耗时(秒)。
+        进程池无法启动(例如当前环境无法导入 airtest)时自动回退到 `airtest report` 子进程。
+        """
+        static_root = static_root or os.path.join(self.project_root, "source")
+        while not self.use_cli:
+            pool = self._get_pool()
+            try:
+                future = pool.submit(render_report, case_path, log_dir, report_path, static_root, lang)
+                return future.result(timeout=REPORT_TIMEOUT)
+            except TimeoutError:
+                # 卡住的报告进程会一直占用进程池，排在它后面的报告都会超时，终止后重建进程池
+                print(f"报告生成超时({REPORT_TIMEOUT}s)，终止并重建报告进程池: {log_dir}")
+                self._discard_pool(pool)
+                raise
+            except (BrokenProcessPool, CancelledError, RuntimeError, ImportError) as e:
+                if not isinstance(e, ImportError) and self._is_replaced(pool):
+                    # 其他报告超时后进程池已被重建，在新的进程池中重试
+                    continue
+                if not isinstance(e, (BrokenProcessPool, ImportError)):
+                    raise
+                traceback.print_exc()
+                print("报告进程池不可用，回退到 airtest report 子进程")
+                self.use_cli = True
+                self.shutdown()
+        return render_report_cli(case_path, log_dir, report_path, static_root, lang)
+
+    def _is_replaced(self, pool):
+        with self.lock:
+            return self.pool is not pool
+
+    def _discard_pool(self, pool):
+        """ 终止进程池中的所有进程，下次渲染时重新创建进程池。"""
+        with self.lock:
+            if self.pool is pool:
+                self.pool = None
+        # ProcessPoolExecutor 没有公开终止进程的接口，shutdown 只会等待卡住的进程
+        for process in list((getattr(pool, "_processes", None) or {}).values()):
+            try:
+                process.terminate()
+            except OSError:
+                pass
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        """ 关闭报告进程池。"""
+        with self.lock:
+            if self.pool is not None:
+                self.pool.shutdown(wait=False, cancel_futures=True)
+                self.pool = None
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+# Airtest-Runner/resource_utils.py
+
+import time
+import threading
+
+import psutil
+
+# 两次采样之间的最小间隔(秒)，多个工作线程同时等待时共享同一份采样
+SAMPLE_INTERVAL = 1.0
+# 资源紧张时的初始退避和最大退避(秒)
+BACKOFF_MIN = 1.0
+BACKOFF_MAX = 8.0
+# 放行一个用例后，至少等待这么久(秒)再放行下一个，让浏览器的内存占用先涨上来
+DEFAULT_SETTLE = 5.0
+
+
+class AdmissionController:
+    def __init__(self, max_cpu=0, max_memory=0, max_load=0, min_free_mb=0, settle=DEFAULT_SETTLE):
+        """
+        基于系统资源的准入控制：只有 CPU、内存和负载都低于阈值时才开始新的用例，
+        资源紧张时按指数退避等待，避免并发的浏览器和 OpenCV 处理把内存耗尽引发频繁换页。
+        没有正在执行的用例时总是放行，保证运行能够继续推进。
+
+        Args:
+            max_cpu (float): CPU 占用率上限(%)，0 表示不检查.
+            max_memory (float): 内存占用率上限(%)，0 表示不检查.
+            max_load (float): 每个 CPU 核心的平均负载上限(1 分钟)，0 表示不检查.
+            min_free_mb (float): 可用内存下限(MB)，0 表示不检查.
+            settle (float): 相邻两次放行之间的最小间隔(秒).
+        """
+        self.max_cpu = float(max_cpu or 0)
+        self.max_memory = float(max_memory or 0)
+        self.max_load = float(max_load or 0)
+        self.min_free_mb = float(min_free_mb or 0)
+        self.settle = float(settle or 0)
+        self.active = 0
+        self.releases = 0
+        self.last_admit = 0
+        self.last_sample = None
+        self.last_sample_time = 0
+        self.condition = threading.Condition()
+        # 第一次调用 cpu_percent 只是建立基准，返回值没有意义
+        psutil.cpu_percent(interval=None)
+
+    @classmethod
+    def from_settings(cls, settings):
+        """ 从 setting.json 的 admit_max_cpu / admit_max_memory / admit_max_load / admit_min_free_mb 创建。"""
+        return cls(
+            max_cpu=settings.get("admit_max_cpu", 0),
+            max_memory=settings.get("admit_max_memory", 0),
+            max_load=settings.get("admit_max_load", 0),
+            min_free_mb=settings.get("admit_min_free_mb", 0),
+            settle=settings.get("admit_settle", DEFAULT_SETTLE),
+        )
+
+    @property
+    def enabled(self):
+        return any((self.max_cpu, self.max_memory, self.max_load, self.min_free_mb))
+
+    def sample(self):
+        """ 采样当前的 CPU、内存和负载，间隔不足 SAMPLE_INTERVAL 时返回上一次的结果。"""
+        now = time.time()
+        if self.last_sample is None or now - self.last_sample_time >= SAMPLE_INTERVAL:
+            memory = psutil.virtual_memory()
+            try:
+                load = psutil.getloadavg()[0] / (psutil.cpu_count() or 1)
+            except (AttributeError, OSError):
+                load = 0.0
+            self.last_sample = {
+                "cpu": psutil.cpu_percent(interval=None),
+                "memory": memory.percent,
+                "free_mb": memory.available / 1024 / 1024,
+                "load": load,
+            }
+            self.last_sample_time = now
+        return self.last_sample
+
+    def get_pressure(self, sample=None):
+        """ 返回超出阈值的原因描述，资源充足时返回 None。"""
+        sample = sample or self.sample()
+        if self.max_cpu and sample["cpu"] >= self.max_cpu:
+            return f"CPU {sample['cpu']:.0f}% >= {self.max_cpu:.0f}%"
+        if self.max_memory and sample["memory"] >= self.max_memory:
+            return f"内存 {sample['memory']:.0f}% >= {self.max_memory:.0f}%"
+        if self.min_free_mb and sample["free_mb"] <= self.min_free_mb:
+            return f"可用内存 {sample['free_mb']:.0f}MB <= {self.min_free_mb:.0f}MB"
+        if self.max_load and sample["load"] >= self.max_load:
+            return f"负载 {sample['load']:.2f} >= {self.max_load:.2f}"
+        return None
+
+    def admit(self, should_continue=None, on_wait=None):
+        """
+        阻塞直到允许开始一个新的用例，返回 True；should_continue 返回 False 时放弃并返回 False。
+        每次成功的 admit() 都必须对应一次 release()。
+
+        Args:
+            should_continue (callable): 是否继续等待.
+            on_wait (callable): 因资源紧张而等待时调用 on_wait(原因)，用于显示状态.
+        """
+        backoff = BACKOFF_MIN
+        next_check = 0
+        with self.condition:
+            releases = self.releases
+            while True:
+                if should_continue is not None and not should_continue():
+                    return False
+                if not self.enabled or self.active == 0:
+                    break
+                if self.releases != releases:
+                    # 有用例结束，资源可能已经释放，立即重新评估
+                    releases = self.releases
+                    backoff = BACKOFF_MIN
+                    next_check = 0
+                now = time.time()
+                ready_at = max(self.last_admit + self.settle, next_check)
+                if now >= ready_at:
+                    reason = self.get_pressure()
+                    if reason is None:
+                        break
+                    if on_wait is not None:
+                        on_wait(reason)
+                    ready_at = next_check = now + backoff
+                    backoff = min(backoff * 2, BACKOFF_MAX)
+                # 分段等待以便及时响应停止请求，有用例结束时会被提前唤醒
+                self.condition.wait(min(1.0, max(0.05, ready_at - now)))
+            self.active += 1
+            self.last_admit = time.time()
+            return True
+
+    def release(self):
+        """ 用例结束，唤醒等待中的线程重新评估。"""
+        with self.condition:
+            self.active = max(0, self.active - 1)
+            self.releases += 1
+            self.condition.notify_all()
@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+# Airtest-Runner/result_utils.py
+
+import os
+import json
+import time
+import shutil
+import threading
+
+import psutil
+
+RUNS_DIR = "runs"
+LATEST_FILE = "latest.json"
+RESULT_HTML = "result.html"
+JOURNAL_FILE = "journal.jsonl"
+# 运行期间存在的锁文件，记录执行该运行的进程
+RUN_LOCK_FILE = "run.lock"
+# 本次运行共享的截图存储，与 tp_airtest_selenium/utils/artifact_store.py 中的约定保持一致
+ARTIFACT_DIR = "artifacts"
+ARTIFACT_ENV_KEY = "AIRTEST_ARTIFACT_DIR"
+
+# 默认保留策略: 最多保留20次运行，不限制时间和磁盘占用
+DEFAULT_KEEP_RUNS = 20
+# 没有汇总报告且超过该时长(小时)未更新的运行视为已中断，可以被清理
+STALE_RUN_HOURS = 24
+
+
+def create_run_dir(result_root, start_time=None):
+    """
+    在 result/runs 下为本次运行创建一个以时间戳命名的目录，并返回其绝对路径。
+    同一秒内启动多次运行时自动追加序号避免冲突。
+    """
+    run_id = time.strftime("%Y%m%d_%H%M%S", time.localtime(start_time or time.time()))
+    runs_root = os.path.join(result_root, RUNS_DIR)
+    os.makedirs(runs_root, exist_ok=True)
+    run_dir = os.path.join(runs_root, run_id)
+    suffix = 1
+    while True:
+        try:
+            os.makedirs(run_dir)
+            lock_run(run_dir)
+            return run_dir
+        except FileExistsError:
+            run_dir = os.path.join(runs_root, f"{run_id}_{suffix}")
+            suffix += 1
+
+
+def lock_run(run_dir):
+    """ 在运行目录中写入锁文件，标记该运行正在由当前进程执行，清理旧运行时会跳过它。"""
+    with open(os.path.join(run_dir, RUN_LOCK_FILE), "w", encoding="utf-8") as f:
+        json.dump({"pid": os.getpid(), "time": time.time()}, f)
+
+
+def release_run(run_dir):
+    """ 运行结束后删除锁文件。"""
+    try:
+        os.remove(os.path.join(run_dir, RUN_LOCK_FILE))
+    except OSError:
+        pass
+
+
+def is_run_live(run_dir, stale_hours=STALE_RUN_HOURS):
+    """
+    判断运行是否可能仍在进行: 锁文件记录的进程仍然存活，
+    或者还没有汇总报告且最近 stale_hours 小时内检查点日志或目录仍有更新。
+    """
+    try:
+        with open(os.path.join(run_dir, RUN_LOCK_FILE), "r", encoding="utf-8") as f:
+            if psutil.pid_exists(int(json.load(f)["pid"])):
+                return True
+    except (IOError, ValueError, KeyError, TypeError):
+        pass
+    if os.path.isfile(os.path.join(run_dir, RESULT_HTML)):
+        return False
+    updated = 0
+    for path in (run_dir, os.path.join(run_dir, JOURNAL_FILE)):
+        try:
+            updated = max(updated, os.path.getmtime(path))
+        except OSError:
+            pass
+    return time.time() - updated < float(stale_hours) * 3600
+
+
+def write_latest_pointer(result_root, run_dir):
+    """
+    记录最新一次运行，并在 result/result.html 写入跳转页，
+    使“打开报告”等入口始终指向最新的运行结果。
+    """
+    relative_run = os.path.relpath(run_dir, result_root).replace('\\', '/')
+    with open(os.path.join(result_root, LATEST_FILE), "w", encoding="utf-8") as f:
+        json.dump({"run": relative_run, "time": time.time()}, f, ensure_ascii=False)
+    target = f"{relative_run}/{RESULT_HTML}"
+    with open(os.path.join(result_root, RESULT_HTML), "w", encoding="utf-8") as f:
+        f.write(
+            "<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\">"
+            f"<meta http-equiv=\"refresh\" content=\"0; url={target}\"></head>"
+            f"<body><a href=\"{target}\">{target}</a></body></html>\n"
+        )
+
+
+def get_artifact_env(run_dir):
+    """
+    让同一次运行的所有用例把截图写入 <运行目录>/artifacts 的环境变量，
+    内容相同的截图(例如每个用例都会经过的登录页)在整个运行中只保存一份。
+    """
+    return {ARTIFACT_ENV_KEY: os.path.join(run_dir, ARTIFACT_DIR)}
+
+
+def get_latest_run_dir(result_root):
+    """ 返回最近一次运行的目录，不存在时返回 None。"""
+    try:
+        with open(os.path.join(result_root, LATEST_FILE), "r", encoding="utf-8") as f:
+            run_dir = os.path.join(result_root, json.load(f)["run"])
+        return run_dir if os.path.isdir(run_dir) else None
+    except (IOError, ValueError, KeyError):
+        return None
+
+
+def get_resumable_run_dir(result_root):
+    """ 返回最近一次带有检查点日志的运行目录，用于续跑；最近一次运行没有检查点日志时返回 None。"""
+    runs = list_runs(result_root)
+    if runs and os.path.isfile(os.path.join(runs[-1], JOURNAL_FILE)):
+        return runs[-1]
+    return None
+
+
+class RunJournal:
+    def __init__(self, run_dir):
+        """
+        运行目录下的检查点日志，每个用例的报告生成后追加一行结果。
+        程序崩溃或机器重启后，可以据此跳过已完成的用例继续执行，或只重跑失败的用例。
+
+        Args:
+            run_dir (str): 运行目录.
+        """
+        self.path = os.path.join(run_dir, JOURNAL_FILE)
+        self.lock = threading.Lock()
+
+    def _append(self, record):
+        """ 每行写入后立即落盘，断电时最多丢失正在写入的一行。"""
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        with self.lock:
+            with open(self.path, "ab+") as f:
+                # 上次中断留下的不完整行先补上换行，避免与新记录粘连
+                if f.tell() > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        line = b"\n" + line
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def start(self, cases, rerun=()):
+        """
+        记录一次执行计划。第一条计划即本次运行的完整用例列表；
+        续跑时追加的计划中 rerun 列出的用例会丢弃之前的结果。
+        """
+        self._append({"cases": list(cases), "rerun": list(rerun), "time": time.time()})
+
+    def record(self, case, tests):
+        """ 记录单个用例在各设备上的结果 {设备: {'status', 'path', ...}}。"""
+        self._append({"case": case, "tests": tests})
+
+    def load(self):
+        """
+        读取检查点日志，返回 (计划执行的用例列表, {用例: tests})。
+        忽略中断时留下的不完整行。
+        """
+        planned = None
+        results = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                lines = f.readlines()
+        except IOError:
+            return [], results
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if "cases" in record:
+                if planned is None:
+                    planned = record["cases"]
+                for case in record.get("rerun", []):
+                    results.pop(case, None)
+            elif "case" in record:
+                results.setdefault(record["case"], {}).update(record.get("tests", {}))
+        return planned or [], results
+
+
+def list_runs(result_root):
+    """ 按时间从旧到新列出所有运行目录。"""
+    runs_root = os.path.join(result_root, RUNS_DIR)
+    if not os.path.isdir(runs_root):
+        return []
+    runs = [os.path.join(runs_root, name) for name in os.listdir(runs_root)]
+    return sorted((path for path in runs if os.path.isdir(path)), key=os.path.getmtime)
+
+
+def get_dir_size(path):
+    """ 统计目录下所有文件的总字节数。"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def apply_retention(result_root, keep_runs=DEFAULT_KEEP_RUNS, keep_days=0, keep_size_mb=0, exclude=()):
+    """
+    按保留策略淘汰旧的运行目录，返回被删除的目录列表。
+
+    Args:
+        result_root (str): 报告根目录.
+        keep_runs (int): 最多保留的运行次数，0 表示不限制.
+        keep_days (float): 超过该天数的运行会被删除，0 表示不限制.
+        keep_size_mb (float): 所有运行目录的总大小上限(MB)，超过时从最旧的开始删除，0 表示不限制.
+        exclude (iterable): 不参与淘汰的目录(例如本进程正在进行中的运行).
+
+    其他进程(命令行、界面或代理)正在进行或尚未完成的运行同样不参与淘汰。
+    """
+    exclude = {os.path.abspath(path) for path in exclude}
+    runs = []
+    for path in list_runs(result_root):
+        if os.path.abspath(path) in exclude:
+            continue
+        if is_run_live(path):
+            exclude.add(os.path.abspath(path))
+            continue
+        runs.append(path)
+    evicted = []
+
+    def evict(path):
+        shutil.rmtree(path, ignore_errors=True)
+        evicted.append(path)
+
+    if keep_days:
+        deadline = time.time() - float(keep_days) * 86400
+        for path in list(runs):
+            if os.path.getmtime(path) < deadline:
+                evict(path)
+                runs.remove(path)
+
+    if keep_runs:
+        # 正在进行中的运行也占用一个名额
+        limit = max(0, int(keep_runs) - len(exclude))
+        while len(runs) > limit:
+            evict(runs.pop(0))
+
+    if keep_size_mb:
+        sizes = {path: get_dir_size(path) for path in runs}
+        budget = float(keep_size_mb) * 1024 * 1024
+        while runs and sum(sizes.values()) > budget:
+            path = runs.pop(0)
+            sizes.pop(path)
+            evict(path)
+
+    return evicted
+
+
+def start_retention(result_root, settings, exclude=()):
+    """
+    在后台线程中按 setting.json 中的 keep_runs / keep_days / keep_size_mb 清理旧运行，
+    新的运行无需等待删除完成即可开始。
+    """
+    def worker():
+        try:
+            evicted = apply_retention(
+                result_root,
+                keep_runs=settings.get("keep_runs", DEFAULT_KEEP_RUNS),
+                keep_days=settings.get("keep_days", 0),
+                keep_size_mb=settings.get("keep_size_mb", 0),
+                exclude=exclude
+            )
+            if evicted:
+                print(f"已清理 {len(evicted)} 个旧的运行目录")
+        except Exception as e:
+            print(f"清理旧的运行目录失败: {e}")
+
+    thread = threading.Thread(target=worker, daemon=True)
+    thread.start()
+    return thread
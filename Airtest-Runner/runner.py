@@ -1,93 +1,410 @@
 # -*- encoding=utf-8 -*-
 import os
+import sys
+import shutil
 import traceback
 import subprocess
 import webbrowser
 import time
 import json
-import shutil
-from jinja2 import Environment, FileSystemLoader
+import locale
+import argparse
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+from template_utils import render_summary
+from device_utils import DeviceRegistry
+from case_utils import get_case_index
+from report_utils import ReportRenderer
+from warm_worker import WarmWorkerPool
+from result_utils import (create_run_dir, start_retention, write_latest_pointer, get_latest_run_dir,
+                          get_resumable_run_dir, get_artifact_env, lock_run, release_run, RunJournal)
+from history_utils import TimingStore
+from resource_utils import AdmissionController
+from event_utils import EventStream
+from metrics_utils import start_metrics
+from log_utils import ConsoleWriter, start_console_reader, finish_console
+from watchdog_utils import CaseWatchdog, get_case_budget, get_watchdog_env
+from cluster_utils import AgentClient, Coordinator
+from archive_utils import export_run, print_progress, serve_archive
 
 def get_script_description(case_script):
     """
-    从用例目录下的readme文件中读取第一行作为脚本描述.
+    从用例索引中获取 readme 文件的第一行作为脚本描述, readme 未修改时不会重新读取文件.
     """
-    try:
-        # 兼容不同操作系统，使用os.path.join
-        readme_path = os.path.join(os.getcwd(), "case", case_script, "readme")
-        if os.path.exists(readme_path):
-            with open(readme_path, "r", encoding="utf-8") as f:
-                # 读取并去除首尾空白字符
-                description = f.readline().strip()
-                return description if description else "暂无脚本描述"
-    except Exception as e:
-        print(f"读取 {case_script} 的readme文件时出错: {e}")
-    return "暂无脚本描述"
+    return get_case_index().get_readme(case_script)
 
-def run(cases):
+class RunContext:
+    """
+    一次运行中各个用例共享的对象: 设备注册表、报告队列、预热进程池和耗时记录.
+    """
+    def __init__(self, registry, log_base_dir, renderer, report_executor, timing_store, journal,
+                 warm_pool=None, admission=None, events=None):
+        self.registry = registry
+        self.log_base_dir = log_base_dir
+        self.renderer = renderer
+        self.report_executor = report_executor
+        self.timing_store = timing_store
+        self.journal = journal
+        self.warm_pool = warm_pool
+        self.admission = admission or AdmissionController()
+        self.events = events
+        self.pending_reports = []
+
+def run(cases, max_workers=None, resume=False, rerun_failed=False):
     """
     运行所有测试用例并生成报告.
+    max_workers 为同时执行的用例数量, 未指定时读取 setting.json 中的 max_workers,
+    仍未配置时等于设备注册表的总容量.
+    resume 为 True 时在最近一次运行目录中继续执行尚未完成的用例, rerun_failed 为 True 时重跑其中失败的用例,
+    两者都会把之前的结果与本次结果合并到同一份汇总报告中.
     """
-    report_dir = get_report_dir()
-    log_base_dir = os.path.join(report_dir, 'log')
+    settings = load_settings()
 
-    # 清理旧的报告和日志
-    if os.path.isdir(report_dir):
-        shutil.rmtree(report_dir)
+    # 每次运行写入独立的时间戳目录, 旧的运行按保留策略在后台清理
+    result_root = get_report_dir()
+    report_dir = get_resumable_run_dir(result_root) if (resume or rerun_failed) else None
+    previous = {}
+    resumed = bool(report_dir)
+    if report_dir:
+        # 续跑期间同样标记为进行中, 避免被其他进程的保留策略清理
+        lock_run(report_dir)
+        journal = RunJournal(report_dir)
+        cases, previous, pending = plan_resume(journal, cases, resume, rerun_failed)
+        log_base_dir = os.path.join(report_dir, 'log')
+        print(f"在 {report_dir} 中续跑 {len(pending)} 个用例, 已有 {len(previous)} 个用例的结果")
+    else:
+        if resume or rerun_failed:
+            print("没有找到可以续跑的运行记录, 开始新的运行")
+        report_dir = create_run_dir(result_root)
+        journal = RunJournal(report_dir)
+        journal.start(cases)
+        pending = cases
+        log_base_dir = os.path.join(report_dir, 'log')
     os.makedirs(log_base_dir, exist_ok=True)
+    start_retention(result_root, settings, exclude=[report_dir])
+    if max_workers is None:
+        max_workers = settings.get("max_workers", 0)
+    max_workers = int(max_workers or 0)
+    # 运行过程以 JSONL 事件写入 events.jsonl, 供外部看板跟踪
+    events = EventStream(report_dir, result_root)
+    # 配置了 metrics_port / metrics_textfile 时以 Prometheus 格式导出运行进度和资源占用
+    exporter = start_metrics(settings, events)
 
     try:
-        results_data = []
         start_time = time.time()
         
-        # 假设只有一个设备用于演示
-        # 在实际多设备场景中, 你需要修改此处的设备列表逻辑
-        devices = ["web_device_1"] 
+        # 设备来自 setting.json 的 devices 声明, 未声明时使用顶层串口/网卡配置作为默认设备
+        registry = DeviceRegistry.from_settings(settings, default_slots=max(1, max_workers))
+        if max_workers <= 0:
+            max_workers = registry.capacity
+        events.emit("run_started", run_dir=report_dir, cases=len(cases), pending=len(pending),
+                    workers=max_workers, resumed=resumed)
 
-        for case in cases:
-            case_results = {'script': case, 'tests': {}}
-            
-            tasks = run_on_devices(case, devices, log_base_dir)
+        # 报告生成在独立的线程池中进行, 与后续用例的执行重叠, 汇总前统一等待
+        report_workers = max(1, int(settings.get("report_workers", 1) or 1))
+        # 常驻报告进程只导入一次 airtest 与报告插件, 避免每个用例都启动新的解释器
+        renderer = ReportRenderer(workers=report_workers)
+        warm_pool = create_warm_pool(settings, max_workers)
+        try:
+            with ThreadPoolExecutor(max_workers=report_workers) as report_executor:
+                ctx = RunContext(registry, log_base_dir, renderer, report_executor,
+                                 TimingStore(result_root), journal, warm_pool,
+                                 AdmissionController.from_settings(settings), events)
+                # 每个用例的日志目录相互独立, 可以安全地并发执行;
+                # 按历史耗时从长到短提交以缩短整体耗时, 结果仍按输入顺序存放
+                with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                    futures = {}
+                    for case in ctx.timing_store.order_longest_first(pending):
+                        events.emit("case_queued", case=case, estimate=round(ctx.timing_store.estimate(case), 3))
+                        futures[case] = executor.submit(run_case, case, ctx)
+                    results_data = [futures[case].result() if case in futures
+                                    else {'script': case, 'tests': previous[case]}
+                                    for case in cases if case in futures or case in previous]
+                join_reports(ctx.pending_reports)
+        finally:
+            renderer.shutdown()
+            if warm_pool:
+                warm_pool.shutdown()
 
-            for task in tasks:
-                status = task['process'].wait()
-                report_info = run_one_report(task['case'], task['dev'], log_base_dir)
-                # 确保status总是存在
-                report_info['status'] = status if status is not None else -1
-                case_results['tests'][task['dev']] = report_info
+        run_summary(results_data, start_time, report_dir, events)
+        events.emit("run_finished", duration=round(time.time() - start_time, 3))
 
-            results_data.append(case_results)
+    except Exception as e:
+        traceback.print_exc()
+        events.emit("run_failed", error=str(e))
+    finally:
+        if exporter:
+            exporter.stop()
+        events.close()
+        release_run(report_dir)
+
+def plan_resume(journal, cases, resume, rerun_failed):
+    """
+    根据检查点日志确定续跑计划, 返回 (原计划的用例, 可沿用的结果, 本次需要执行的用例).
+    需要重跑的失败用例会先清空旧的日志目录.
+    """
+    planned, previous = journal.load()
+    cases = planned or cases
+    failed = {case for case, tests in previous.items()
+              if any(test.get('status') != 0 for test in tests.values())}
+    pending = [case for case in cases
+               if (resume and case not in previous) or (rerun_failed and case in failed)]
+    rerun = [case for case in pending if case in previous]
+    for case in rerun:
+        previous.pop(case)
+        shutil.rmtree(os.path.join(os.path.dirname(journal.path), 'log', case), ignore_errors=True)
+    journal.start(pending, rerun=rerun)
+    return cases, previous, pending
 
-        run_summary(results_data, start_time)
+def create_warm_pool(settings, size):
+    """
+    启用 warm_workers 时创建并启动预热进程池, 用例在预先导入依赖的常驻进程中执行; 否则返回 None.
+    """
+    if not settings.get("warm_workers"):
+        return None
+    env = os.environ.copy()
+    env['PROJECT_ROOT'] = os.getcwd()
+    warm_pool = WarmWorkerPool(size, python=settings.get("python_path") or None, env=env)
+    warm_pool.start()
+    return warm_pool
 
+def run_coordinator(cases, address):
+    """
+    协调端模式: 通过 TCP 向代理分发用例, 接收代理上传的日志和状态, 在本机生成报告和汇总.
+    """
+    settings = load_settings()
+    result_root = get_report_dir()
+    report_dir = create_run_dir(result_root)
+    log_base_dir = os.path.join(report_dir, 'log')
+    os.makedirs(log_base_dir, exist_ok=True)
+    start_retention(result_root, settings, exclude=[report_dir])
+
+    try:
+        start_time = time.time()
+        timing_store = TimingStore(result_root)
+        report_workers = max(1, int(settings.get("report_workers", 1) or 1))
+        renderer = ReportRenderer(workers=report_workers)
+        results = {case: {'script': case, 'tests': {}} for case in cases}
+        pending_reports = []
+        try:
+            with ThreadPoolExecutor(max_workers=report_workers) as report_executor:
+                def on_result(result):
+                    case, dev, status = result['case'], result['dev'], result['status']
+                    print(f"收到结果: '{case}' @ {dev}, 状态 {status}")
+                    if result.get('duration') is not None:
+                        timing_store.record(case, result['duration'], status)
+                    tests = results[case]['tests']
+                    tests[dev] = {'status': status if status is not None else -1, 'path': ''}
+                    future = report_executor.submit(run_one_report, case, dev, log_base_dir, renderer)
+                    pending_reports.append((tests, dev, future))
+
+                coordinator = Coordinator(timing_store.order_longest_first(cases), log_base_dir,
+                                          address=address, on_result=on_result)
+                coordinator.start()
+                try:
+                    coordinator.wait()
+                finally:
+                    coordinator.shutdown()
+                join_reports(pending_reports)
+        finally:
+            renderer.shutdown()
+
+        run_summary([results[case] for case in cases], start_time, report_dir)
+
+    except Exception:
+        traceback.print_exc()
+    finally:
+        release_run(report_dir)
+
+def run_agent(address, name=None, max_workers=None):
+    """
+    代理端模式: 从协调端拉取用例在本机设备上执行, 执行完成后上传日志目录和状态.
+    每个工作线程维持一条到协调端的连接, 断开时协调端会把未完成的用例重新分发.
+    """
+    settings = load_settings()
+    result_root = get_report_dir()
+    report_dir = create_run_dir(result_root)
+    log_base_dir = os.path.join(report_dir, 'log')
+    os.makedirs(log_base_dir, exist_ok=True)
+    start_retention(result_root, settings, exclude=[report_dir])
+
+    if max_workers is None:
+        max_workers = settings.get("max_workers", 0)
+    max_workers = int(max_workers or 0)
+    registry = DeviceRegistry.from_settings(settings, default_slots=max(1, max_workers))
+    if max_workers <= 0:
+        max_workers = registry.capacity
+    warm_pool = create_warm_pool(settings, max_workers)
+    admission = AdmissionController.from_settings(settings)
+
+    def agent_worker(_):
+        client = AgentClient(address, name=name)
+        try:
+            while True:
+                case = client.next_case()
+                if not case:
+                    break
+                requires = get_case_index().get_requires(case)
+                device = registry.lease(requires)
+                if device is None:
+                    print(f"没有满足 '{case}' 要求 {requires} 的设备, 上报失败")
+                    client.upload(case, 'no_device', -1, get_log_dir(case, 'no_device', log_base_dir))
+                    continue
+                admission.admit(on_wait=lambda reason: print(f"系统资源紧张({reason}), '{case}' 等待执行"))
+                try:
+                    start_time = time.time()
+                    for task in run_on_devices(case, [device], log_base_dir, warm_pool):
+                        status = wait_task(task)
+                        client.upload(case, task['dev'], status if status is not None else -1,
+                                      get_log_dir(case, task['dev'], log_base_dir),
+                                      duration=time.time() - start_time)
+                finally:
+                    admission.release()
+                    registry.release(device)
+        finally:
+            client.close()
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(agent_worker, range(max_workers)))
     except Exception:
         traceback.print_exc()
+    finally:
+        if warm_pool:
+            warm_pool.shutdown()
+        release_run(report_dir)
 
-def run_on_devices(case, devices, log_base_dir):
+def run_case(case, ctx):
     """
-    在指定设备上运行单个测试用例.
+    从注册表租用一台满足用例要求的设备, 执行用例并把报告生成排入后台队列, 返回该用例的结果数据.
+    """
+    case_results = {'script': case, 'tests': {}}
+    requires = get_case_index().get_requires(case)
+    device = ctx.registry.lease(requires)
+    if device is None:
+        print(f"没有满足 '{case}' 要求 {requires} 的设备, 已跳过")
+        case_results['tests']['no_device'] = {'status': -1, 'path': ''}
+        ctx.journal.record(case, case_results['tests'])
+        ctx.events.emit("case_finished", case=case, device=None, status=-1, duration=0, reason="no_device")
+        return case_results
+
+    # 设备空闲后还需要系统资源允许, 才真正启动用例
+    ctx.admission.admit(on_wait=lambda reason: print(f"系统资源紧张({reason}), '{case}' 等待执行"))
+    try:
+        start_time = time.time()
+        ctx.events.emit("case_started", case=case, device=device.name)
+        # 截图写入运行目录下共享的 artifacts, 相同的画面在各用例之间只保存一次
+        tasks = run_on_devices(case, [device], ctx.log_base_dir, ctx.warm_pool,
+                               artifact_env=get_artifact_env(os.path.dirname(ctx.log_base_dir)))
+
+        for task in tasks:
+            status = wait_task(task)
+            duration = time.time() - start_time
+            ctx.timing_store.record(case, duration, status)
+            ctx.events.emit("case_finished", case=case, device=task['dev'], status=status,
+                            duration=round(duration, 3))
+            # 确保status总是存在; 报告路径在报告生成完成后由 join_reports 填入
+            tests = case_results['tests']
+            tests[task['dev']] = {'status': status if status is not None else -1, 'path': ''}
+            future = ctx.report_executor.submit(
+                run_report_and_record, task['case'], task['dev'], tests[task['dev']]['status'], ctx)
+            ctx.pending_reports.append((tests, task['dev'], future))
+    finally:
+        ctx.admission.release()
+        ctx.registry.release(device)
+    return case_results
+
+def join_reports(pending_reports):
+    """
+    等待所有排队中的报告生成完毕, 并把报告路径写回对应用例的结果.
+    """
+    for tests, dev, future in pending_reports:
+        try:
+            report_info = future.result()
+            report_info.pop('status', None)
+            tests[dev].update(report_info)
+        except Exception:
+            traceback.print_exc()
+    pending_reports.clear()
+
+def run_report_and_record(case, dev, status, ctx):
+    """
+    生成报告后把用例结果追加到检查点日志, 中断后续跑时据此跳过已完成的用例.
+    """
+    report_info = run_one_report(case, dev, ctx.log_base_dir, ctx.renderer)
+    test = {key: value for key, value in report_info.items() if key != 'status'}
+    test['status'] = status
+    ctx.journal.record(case, {dev: test})
+    ctx.events.emit("report_rendered", case=case, device=dev, ok=report_info.get('status') == 0,
+                    path=report_info.get('path', ''), report_time=report_info.get('report_time'))
+    return report_info
+
+def run_on_devices(case, devices, log_base_dir, warm_pool=None, artifact_env=None):
+    """
+    在指定设备上运行单个测试用例. 提供 warm_pool 时在预热进程中执行.
+    未提供 artifact_env 时截图存放在各自的日志目录中(代理模式下随日志目录一起上传).
     """
     case_name = os.path.splitext(case)[0]
     case_path = os.path.join(os.getcwd(), "case", case, f"{case_name}.py")
+    budget = get_case_budget(load_settings(), get_case_index().get_timeout(case))
     tasks = []
-    for dev in devices:
+    for device in devices:
+        dev = device.name
         log_dir = get_log_dir(case, dev, log_base_dir)
+        # 启用看门狗时让用例进程监听诊断请求, 卡死时可以输出调用栈和截图
+        task_env = get_watchdog_env(log_dir) if any(budget) else {}
+        task_env.update(artifact_env or {})
         print(f"执行脚本 '{case}' 在设备 '{dev}' 上, 日志路径: {log_dir}")
         
         cmd = ["airtest", "run", case_path, "--log", log_dir, "--recording"]
         try:
+            # 控制台输出在打印的同时写入日志目录下的 console.log
+            console = ConsoleWriter(log_dir)
+            if warm_pool:
+                def on_output(line, console=console):
+                    console.write(line)
+                    print(line)
+
+                tasks.append({
+                    'process': warm_pool.submit(case_path, log_dir, env=device.to_env(task_env),
+                                                on_output=on_output),
+                    'dev': dev,
+                    'case': case,
+                    'console': console,
+                    'log_dir': log_dir,
+                    'budget': budget
+                })
+                continue
             # 使用 shell=True (Windows) or False (Linux/MacOS)
             is_windows = os.name == 'nt'
+            process = subprocess.Popen(cmd, cwd=os.getcwd(), shell=is_windows,
+                                       env=device.to_env(dict(os.environ, **task_env)),
+                                       stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+                                       encoding=locale.getpreferredencoding(False), errors='replace',
+                                       bufsize=1)
             tasks.append({
-                'process': subprocess.Popen(cmd, cwd=os.getcwd(), shell=is_windows),
+                'process': process,
                 'dev': dev,
-                'case': case
+                'case': case,
+                'console': console,
+                'reader': start_console_reader(process.stdout, console, on_line=print),
+                'log_dir': log_dir,
+                'budget': budget
             })
         except Exception:
             traceback.print_exc()
     return tasks
 
-def run_one_report(case, dev, log_base_dir):
+def wait_task(task):
+    """
+    等待用例进程结束并确保控制台输出全部写入 console.log, 返回退出码.
+    超出时长预算或长时间无输出时由看门狗结束进程树, 返回 TIMEOUT_STATUS.
+    """
+    status = CaseWatchdog(task['process'], task['log_dir'], task['console'], *task['budget']).wait()
+    finish_console(task['console'], task.get('reader'))
+    return status
+
+def run_one_report(case, dev, log_base_dir, renderer):
     """
     为单次运行生成Airtest报告.
     """
@@ -98,29 +415,20 @@ def run_one_report(case, dev, log_base_dir):
     try:
         if os.path.isfile(log_txt):
             report_path = os.path.join(log_dir, 'log.html')
-            static_source_path = os.path.join(os.getcwd(), "source")
-            cmd = [
-                "airtest", "report", case_path,
-                "--log_root", log_dir,
-                "--outfile", report_path,
-                "--static_root", static_source_path,
-                "--lang", "zh",
-                "--plugin", "tp_airtest_selenium.report"
-            ]
-            is_windows = os.name == 'nt'
-            subprocess.call(cmd, shell=is_windows, cwd=os.getcwd())
+            report_time = renderer.render(case_path, log_dir, report_path)
+            print(f"报告生成完成: '{case}' 耗时 {report_time:.2f}s")
             
-            relative_path = os.path.join("log", case, dev, 'log.html').replace('\\', '/')
-            return {'status': 0, 'path': relative_path}
+            relative_path = os.path.relpath(report_path, os.path.dirname(log_base_dir)).replace('\\', '/')
+            return {'status': 0, 'path': relative_path, 'report_time': round(report_time, 3)}
         else:
             print(f"报告生成失败: 未找到log.txt in {log_dir}")
     except Exception:
         traceback.print_exc()
     return {'status': -1, 'path': ''}
 
-def run_summary(data, start_time):
+def run_summary(data, start_time, report_dir, events=None):
     """
-    汇总所有结果并生成最终的聚合报告.
+    汇总所有结果并在本次运行目录中生成最终的聚合报告.
     """
     try:
         all_statuses = []
@@ -141,14 +449,12 @@ def run_summary(data, start_time):
             with open("setting.json", "r", encoding="utf-8") as f:
                 summary.update(json.load(f))
 
-        template_dir = os.path.join(os.getcwd(), "source")
-        env = Environment(loader=FileSystemLoader(template_dir), trim_blocks=True)
-        template = env.get_template('template')
-        html = template.render(data=summary)
-
-        report_path = os.path.join(get_report_dir(), "result.html")
-        with open(report_path, "w", encoding="utf-8") as f:
-            f.write(html)
+        # 用例结果写入 result_data.js, result.html 只是按页渲染的页面框架
+        report_path = render_summary(report_dir, summary)
+        write_latest_pointer(get_report_dir(), report_dir)
+        if events is not None:
+            events.emit("summary_written", path=report_path, success=summary['success'],
+                        count=summary['count'], duration=float(summary['time']))
         
         # 使用file URI scheme确保跨平台兼容性
         webbrowser.open('file://' + os.path.realpath(report_path))
@@ -166,6 +472,18 @@ def get_log_dir(case, device, log_base_dir):
     os.makedirs(log_dir, exist_ok=True)
     return log_dir
 
+def load_settings():
+    """
+    读取当前目录下的 setting.json, 不存在或格式错误时返回空字典.
+    """
+    if os.path.exists("setting.json"):
+        try:
+            with open("setting.json", "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            print(f"读取 setting.json 失败: {e}")
+    return {}
+
 def get_report_dir():
     """
     获取报告的根目录.
@@ -173,15 +491,99 @@ def get_report_dir():
     return os.path.join(os.getcwd(), "result")
 
 def get_cases():
-    """ 从 'case' 文件夹获取所有测试用例。""" 
-    case_dir = os.path.join(os.getcwd(), "case")
-    if not os.path.isdir(case_dir):
-        return []
-    return sorted([name for name in os.listdir(case_dir)])
+    """ 从 'case' 文件夹获取所有测试用例, 同时增量更新用例索引。""" 
+    return get_case_index().refresh()
+
+def export_archive(run_dir=None, output_path=None, fmt=None):
+    """
+    把一次运行(默认为最近一次)导出为单个 zip/tar 文件, 返回输出路径.
+    """
+    run_dir = run_dir or get_latest_run_dir(get_report_dir())
+    if not run_dir or not os.path.isdir(run_dir):
+        print("未找到要导出的运行目录")
+        return None
+    run_name = os.path.basename(os.path.normpath(run_dir))
+    output_path = output_path or os.path.join(get_report_dir(), f"{run_name}.{fmt or 'zip'}")
+    print(f"正在导出 {run_dir} -> {output_path}")
+    start = time.time()
+    try:
+        manifest = export_run(run_dir, output_path, fmt=fmt, on_progress=print_progress)
+    except OSError as e:
+        print(f"导出失败: {e}")
+        return None
+    print(f"导出完成: {len(manifest['files'])} 个文件, 耗时 {time.time() - start:.1f}s")
+    return output_path
+
+def view_archive(archive_path):
+    """
+    在本机启动服务, 直接从导出的归档中打开报告, 无需解压; Ctrl+C 结束.
+    """
+    server, url = serve_archive(archive_path)
+    print(f"正在查看 {archive_path}: {url}")
+    webbrowser.open(url)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.reader.close()
+
+def parse_args():
+    """
+    解析命令行参数.
+    """
+    parser = argparse.ArgumentParser(description="运行 case 目录下的 Airtest 用例并生成汇总报告")
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="同时执行的用例数量, 默认读取 setting.json 中的 max_workers")
+    parser.add_argument("--shard", default=None,
+                        help="只运行第 i 个分片, 格式为 i/n (i 从 1 开始), 分片按历史耗时均衡划分")
+    parser.add_argument("--resume", action="store_true",
+                        help="在最近一次运行目录中继续执行尚未完成的用例, 并合并之前的结果")
+    parser.add_argument("--rerun-failed", action="store_true",
+                        help="在最近一次运行目录中只重跑失败的用例, 并合并之前的结果")
+    parser.add_argument("--coordinator", metavar="[HOST:]PORT", default=None,
+                        help="协调端模式: 在指定地址上分发用例并汇总各代理的结果, 只写端口时只监听本机, 跨主机请使用 0.0.0.0:PORT")
+    parser.add_argument("--agent", metavar="HOST:PORT", default=None,
+                        help="代理端模式: 从指定的协调端拉取用例执行并上传结果")
+    parser.add_argument("--name", default=None,
+                        help="代理名称, 默认为 主机名-进程号")
+    parser.add_argument("--export", metavar="RUN_DIR", nargs="?", const="", default=None,
+                        help="把运行目录(默认为最近一次运行)导出为单个 zip/tar 文件")
+    parser.add_argument("--output", default=None,
+                        help="导出文件路径, 默认为 result/<运行>.zip")
+    parser.add_argument("--format", choices=("zip", "tar"), default=None,
+                        help="导出格式, 默认按 --output 的扩展名判断")
+    parser.add_argument("--view", metavar="ARCHIVE", default=None,
+                        help="不解压, 直接在浏览器中查看导出的归档")
+    return parser.parse_args()
+
+def select_shard(cases, shard):
+    """
+    按 'i/n' 从用例中选出按历史耗时均衡划分的第 i 个分片.
+    """
+    index, count = (int(x) for x in shard.split("/"))
+    if not 1 <= index <= count:
+        raise ValueError(f"无效的分片: {shard}")
+    return sorted(TimingStore(get_report_dir()).shard(cases, count)[index - 1])
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    args = parse_args()
+    if args.export is not None:
+        sys.exit(0 if export_archive(args.export or None, args.output, args.format) else 1)
+    if args.view:
+        view_archive(args.view)
+        sys.exit(0)
+    if args.agent:
+        run_agent(args.agent, name=args.name, max_workers=args.workers)
+        sys.exit(0)
     all_cases = get_cases()
-    if all_cases:
-        run(all_cases)
+    if all_cases and args.shard:
+        all_cases = select_shard(all_cases, args.shard)
+    if all_cases and args.coordinator:
+        run_coordinator(all_cases, args.coordinator)
+    elif all_cases:
+        run(all_cases, max_workers=args.workers, resume=args.resume, rerun_failed=args.rerun_failed)
     else:
         print("未找到任何测试用例，程序退出。")
\ No newline at end of file
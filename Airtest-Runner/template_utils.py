@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+# Airtest-Runner/template_utils.py
+
+import os
+import json
+import threading
+
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache
+
+SUMMARY_TEMPLATE = "template.html"
+SUMMARY_FILE = "result.html"
+# 汇总报告的用例数据，以脚本形式存放，直接双击打开 result.html 时也能加载(file:// 下无法 fetch JSON)
+SUMMARY_DATA_FILE = "result_data.js"
+# 编译后的模板字节码缓存目录(位于 result 下，不受运行目录保留策略影响)
+TEMPLATE_CACHE_DIR = "template_cache"
+# 流式渲染时每次写入文件前累积的片段数
+STREAM_BUFFER_SIZE = 64
+
+_environments = {}
+_environments_lock = threading.Lock()
+
+
+def get_template_env(template_dir=None, cache_dir=None):
+    """
+    返回共享的 Jinja2 环境：同一模板目录只创建一次，编译结果既缓存在内存中，
+    也以字节码形式缓存到磁盘，新进程再次渲染时不必重新解析模板。
+    模板文件修改后会按修改时间自动重新编译。
+
+    Args:
+        template_dir (str): 模板目录，默认为当前目录下的 source.
+        cache_dir (str): 字节码缓存目录，默认为 result/template_cache.
+    """
+    template_dir = template_dir or os.path.join(os.getcwd(), "source")
+    cache_dir = cache_dir or os.path.join(os.getcwd(), "result", TEMPLATE_CACHE_DIR)
+    with _environments_lock:
+        env = _environments.get(template_dir)
+        if env is None:
+            bytecode_cache = None
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+                bytecode_cache = FileSystemBytecodeCache(cache_dir, pattern="__summary_%s.cache")
+            except OSError as e:
+                print(f"创建模板缓存目录失败: {e}")
+            env = Environment(loader=FileSystemLoader(template_dir), trim_blocks=True,
+                              bytecode_cache=bytecode_cache)
+            _environments[template_dir] = env
+        return env
+
+
+def render_to_file(output_path, template_name=SUMMARY_TEMPLATE, env=None, **template_vars):
+    """
+    以 generate() 流式渲染模板并边渲染边写入 output_path，
+    几千行的汇总报告也不需要先在内存中拼出完整的 HTML 字符串。
+    """
+    env = env or get_template_env()
+    stream = env.get_template(template_name).stream(**template_vars)
+    stream.enable_buffering(STREAM_BUFFER_SIZE)
+    with open(output_path, "w", encoding="utf-8") as f:
+        stream.dump(f)
+    return output_path
+
+
+def write_summary_data(path, results):
+    """
+    把用例结果写成紧凑的数据文件：用例名和描述只出现一次，每个 用例×设备 结果是一行
+    [用例序号, 设备, 状态, 报告路径]。边序列化边写入，先写临时文件再替换。
+    """
+    scripts = []
+    rows = []
+    for i, dt in enumerate(results):
+        scripts.append([dt['script'], dt.get('description', '')])
+        for dev, test in dt['tests'].items():
+            rows.append([i, dev, test.get('status', -1), test.get('path') or ''])
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write("window.RESULT_DATA = ")
+        json.dump({"scripts": scripts, "rows": rows}, f, ensure_ascii=False, separators=(",", ":"))
+        f.write(";\n")
+    os.replace(temp_path, path)
+    return path
+
+
+def get_static_root(report_dir, source_dir=None):
+    """ 汇总报告引用 source 下脚本的路径，优先使用相对路径以便整个目录一起拷贝。"""
+    source_dir = source_dir or os.path.join(os.getcwd(), "source")
+    try:
+        return os.path.relpath(source_dir, report_dir).replace('\\', '/') + "/"
+    except ValueError:
+        # Windows 上位于不同盘符时无法使用相对路径
+        return "file:///" + os.path.abspath(source_dir).replace('\\', '/') + "/"
+
+
+def render_summary(report_dir, summary):
+    """
+    生成汇总报告：用例结果写入 result_data.js，result.html 只包含概览和页面框架，
+    由浏览器按页渲染结果行并在本地过滤，几千行的运行也能很快打开。
+
+    Args:
+        report_dir (str): 本次运行的目录.
+        summary (dict): 汇总数据，其中 result 为各用例的结果列表.
+
+    Returns:
+        str: result.html 的路径.
+    """
+    write_summary_data(os.path.join(report_dir, SUMMARY_DATA_FILE), summary.get("result", []))
+    overview = {key: value for key, value in summary.items() if key != "result"}
+    return render_to_file(os.path.join(report_dir, SUMMARY_FILE), data=overview,
+                          static_root=get_static_root(report_dir), data_file=SUMMARY_DATA_FILE)
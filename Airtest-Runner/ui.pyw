@@ -1,7 +1,5 @@
 import json
 import os
-import re
-import shutil
 import subprocess
 import sys
 import time
@@ -9,20 +7,38 @@ import traceback
 import webbrowser
 import ctypes
 import threading
+import multiprocessing
+import locale
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 #  第三方库导入
 import psutil
 import serial
 import serial.tools.list_ports
-from jinja2 import Environment, FileSystemLoader
+from template_utils import render_summary
+
+#  本地模块导入
+from device_utils import DeviceRegistry
+from case_utils import get_case_index
+from report_utils import ReportRenderer
+from warm_worker import WarmWorkerPool
+from result_utils import create_run_dir, start_retention, write_latest_pointer, get_artifact_env, release_run, RunJournal
+from history_utils import TimingStore
+from resource_utils import AdmissionController
+from event_utils import EventStream
+from metrics_utils import start_metrics
+from watchdog_utils import (CaseWatchdog, get_case_budget, get_watchdog_env, get_process_group_kwargs,
+                            teardown_processes)
+from log_utils import (LogBuffer, ALL_CASES, DEFAULT_MAX_LINES, LOG_FLUSH_INTERVAL, format_line,
+                       ConsoleWriter, start_console_reader, finish_console, read_console, CONSOLE_WINDOWS)
 
 #  PyQt6 库导入
-from PyQt6.QtCore import QSize, Qt, QThread, QTimer, pyqtSignal
-from PyQt6.QtGui import QIcon
+from PyQt6.QtCore import QAbstractListModel, QModelIndex, QSize, Qt, QThread, QTimer, pyqtSignal
+from PyQt6.QtGui import QFontDatabase, QIcon
 from PyQt6.QtWidgets import (QApplication, QCheckBox, QComboBox, QDialog,
                              QFileDialog, QFrame, QGridLayout, QHBoxLayout,
                              QHeaderView, QInputDialog, QLabel, QLineEdit,
-                             QProgressBar, QPushButton, QScrollArea, QSizePolicy,
+                             QListView, QProgressBar, QPushButton, QScrollArea, QSizePolicy,
                              QStackedWidget, QStyle, QStyledItemDelegate,
                              QTableWidget, QTableWidgetItem, QVBoxLayout,
                              QWidget)
@@ -89,6 +105,43 @@ class DoubleClickLineEdit(QLineEdit):
         self.deselect()
 
 
+class LogListModel(QAbstractListModel):
+    """ 实时日志面板的数据模型，只保留最近 max_lines 行，配合 QListView 只绘制可见的行。"""
+    def __init__(self, max_lines=DEFAULT_MAX_LINES, parent=None):
+        super().__init__(parent)
+        self.max_lines = max_lines
+        self.lines = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.lines)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and index.isValid():
+            return self.lines[index.row()]
+        return None
+
+    def set_lines(self, lines):
+        """ 切换查看的用例时整体替换。"""
+        self.beginResetModel()
+        self.lines = list(lines)[-self.max_lines:]
+        self.endResetModel()
+
+    def append_lines(self, lines):
+        """ 批量追加一次刷新得到的新行，超出上限时先移除最旧的行。"""
+        if not lines:
+            return
+        lines = lines[-self.max_lines:]
+        overflow = len(self.lines) + len(lines) - self.max_lines
+        if overflow > 0:
+            self.beginRemoveRows(QModelIndex(), 0, overflow - 1)
+            del self.lines[:overflow]
+            self.endRemoveRows()
+        start = len(self.lines)
+        self.beginInsertRows(QModelIndex(), start, start + len(lines) - 1)
+        self.lines.extend(lines)
+        self.endInsertRows()
+
+
 # =====================================================================================================================
 #  其他参数设置页面
 # =====================================================================================================================
@@ -313,19 +366,8 @@ class OtherSettingsPage(QWidget):
 #  测试脚本执行逻辑
 # =====================================================================================================================
 def get_script_description(case_script):
-    """ 从测试脚本文件中提取 __brief__ 描述。"""
-    try:
-        script_name = os.path.splitext(case_script)[0]
-        script_path = os.path.join(os.getcwd(), "case", case_script, f"{script_name}.py")
-        if os.path.exists(script_path):
-            with open(script_path, "r", encoding="utf-8") as f:
-                content = f.read()
-                match = re.search(r'\s*__brief__\s*=\s*["\'](.*?)["\']', content)
-                if match:
-                    return match.group(1).strip()
-    except Exception as e:
-        print(f"读取 {case_script} 的 __brief__ 时出错: {e}")
-    return "暂无脚本描述"
+    """ 从用例索引中获取测试脚本的 __brief__ 描述，脚本未修改时不会重新读取文件。"""
+    return get_case_index().get_brief(case_script)
 
 
 def get_report_dir():
@@ -342,11 +384,8 @@ def get_log_dir(case, device, log_base_dir):
 
 
 def get_cases():
-    """ 从 'case' 文件夹获取所有测试用例。"""
-    case_dir = os.path.join(os.getcwd(), "case")
-    if not os.path.isdir(case_dir):
-        return []
-    return sorted([name for name in os.listdir(case_dir)])
+    """ 从 'case' 文件夹获取所有测试用例，同时增量更新用例索引。"""
+    return get_case_index().refresh()
 
 
 class PortCheckThread(QThread):
@@ -377,7 +416,7 @@ class RunnerThread(QThread):
     status_update = pyqtSignal(str)
     progress_update = pyqtSignal(int)
     finished = pyqtSignal(str)
-    log_update = pyqtSignal(str)
+    eta_update = pyqtSignal(float)
 
     def __init__(self, cases, settings):
         super().__init__()
@@ -385,99 +424,284 @@ class RunnerThread(QThread):
         self.settings = settings
         self.running = True
         self.process_list = []
-        self.report_dir = get_report_dir()
+        # 每次运行写入 result/runs 下独立的时间戳目录，report_dir 在运行开始时创建
+        self.result_root = get_report_dir()
+        self.report_dir = None
+        # 检查点日志，界面或机器中途崩溃后可以用 runner.py --resume 在同一运行目录中续跑
+        self.journal = None
+        # 结构化的运行事件流(events.jsonl)，外部看板跟踪该文件即可获得进度
+        self.events = None
+        self.metrics_exporter = None
+        # 同时执行的用例数量，可在“其他参数设置”中通过 max_workers 配置；
+        # 未配置时等于设备注册表的总容量，让每台设备都保持忙碌
+        self.max_workers = int(settings.get("max_workers", 0) or 0)
+        self.device_registry = None
+        # 按 CPU、内存和负载决定是否开始新的用例，阈值在“其他参数设置”中配置，默认不限制
+        self.admission = AdmissionController.from_settings(settings)
+        # 报告生成在独立的线程池中进行，与后续用例的执行重叠
+        self.report_workers = max(1, int(settings.get("report_workers", 1) or 1))
+        self.report_executor = None
+        self.report_renderer = None
+        self.pending_reports = []
+        # 启用 warm_workers 后用例在预先导入依赖的常驻进程中执行，省去每个用例的解释器启动开销
+        self.warm_pool = None
+        # 历史耗时记录用于按从长到短的顺序调度用例，并估计剩余时间
+        self.timing_store = TimingStore(self.result_root)
+        self.state_lock = threading.Lock()
+        self.pending_cases = set()
+        self.running_cases = {}
+        # 子进程输出先写入环形缓冲区，由界面定时批量取走，避免逐行发送信号阻塞事件循环
+        self.log_buffer = LogBuffer(max_lines=settings.get("log_lines", DEFAULT_MAX_LINES))
+        # 每个用例写入 console.log 的日志目录，界面按时间窗口从中读取超出缓冲区的历史输出
+        self.console_dirs = {}
+
+    def _emit_log_line(self, line):
+        """ 预热进程中不属于任何用例的输出。"""
+        if self.running:
+            self.log_buffer.append(ALL_CASES, line.strip())
 
-    def _stream_reader(self, stream):
-        """
-        在一个专用线程中读取子进程的输出流，并将每一行通过信号发出。
-        """
-        for line in iter(stream.readline, ''):
-            if not self.running:
-                break
-            self.log_update.emit(line.strip())
-        stream.close()
+    @staticmethod
+    def _get_base_env():
+        """ 构建用例子进程共用的环境变量。"""
+        base_env = os.environ.copy()
+        base_env['PROJECT_ROOT'] = os.getcwd()
+        # Force unbuffered output for the Python-based subprocess (airtest).
+        # This ensures logs are sent line-by-line in real-time.
+        base_env['PYTHONUNBUFFERED'] = "1"
+        return base_env
 
     def run(self):
         """ 线程的主执行函数。"""
-        report_dir = self.report_dir
-        log_base_dir = os.path.join(report_dir, 'log')
-        
-        if os.path.isdir(report_dir):
-            try:
-                shutil.rmtree(report_dir)
-            except PermissionError as e:
-                self.status_update.emit(f"清理报告目录失败: {e}")
-                time.sleep(1)
-                try:
-                    shutil.rmtree(report_dir)
-                except Exception as e_retry:
-                    self.status_update.emit(f"重试清理失败: {e_retry}")
-                    self.finished.emit("")
-                    return
+        try:
+            self.report_dir = create_run_dir(self.result_root, self.settings.get('start_time'))
+        except OSError as e:
+            self.status_update.emit(f"创建报告目录失败: {e}")
+            self.finished.emit("")
+            return
+        log_base_dir = os.path.join(self.report_dir, 'log')
         os.makedirs(log_base_dir, exist_ok=True)
+        self.journal = RunJournal(self.report_dir)
+        self.journal.start(self.cases)
+        self.events = EventStream(self.report_dir, self.result_root)
+        self.metrics_exporter = start_metrics(self.settings, self.events)
+        # 旧的运行目录按保留策略在后台清理，不阻塞本次运行的启动
+        start_retention(self.result_root, self.settings, exclude=[self.report_dir])
 
         try:
-            results_data = []
+            self.device_registry = DeviceRegistry.from_settings(
+                self.settings, default_slots=max(1, self.max_workers))
+            if self.max_workers <= 0:
+                self.max_workers = self.device_registry.capacity
             total_cases = len(self.cases)
-            for i, case in enumerate(self.cases):
-                if not self.running:
-                    break
-                self.status_update.emit(f"正在运行: {case} ({i+1}/{total_cases})")
-                case_results = {'script': case, 'tests': {}}
-                
-                tasks = self.run_on_devices(case, ["web_device"], log_base_dir)
-                
-                for task in tasks:
-                    if not self.running:
-                        break
-                    # 等待进程结束，同时检查是否需要手动停止
-                    while task['process'].poll() is None:
-                        if not self.running:
-                            task['process'].terminate()
-                            break
-                        time.sleep(0.1)
+            # 结果按用例原始顺序存放，保证并发执行时汇总报告的顺序不变
+            results_data = [None] * total_cases
+            completed = 0
+            self.report_executor = ThreadPoolExecutor(max_workers=self.report_workers)
+            # 常驻报告进程只导入一次 airtest 与报告插件，避免每个用例都启动新的解释器
+            self.report_renderer = ReportRenderer(workers=self.report_workers)
+            if self.settings.get("warm_workers"):
+                self.warm_pool = WarmWorkerPool(
+                    self.max_workers,
+                    python=self.settings.get("python_path") or None,
+                    env=self._get_base_env(),
+                    on_output=self._emit_log_line
+                )
+                self.warm_pool.start()
+            # 按历史耗时从长到短提交，结果仍按原始顺序存放
+            self.pending_cases = set(self.cases)
+            self._emit_eta()
+            self.events.emit("run_started", run_dir=self.report_dir, cases=total_cases, pending=total_cases,
+                             workers=self.max_workers, resumed=False)
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = {}
+                for case in self.timing_store.order_longest_first(self.cases):
+                    self.events.emit("case_queued", case=case, estimate=round(self.timing_store.estimate(case), 3))
+                    futures[executor.submit(self.run_case, self.cases.index(case), case, log_base_dir)] = \
+                        self.cases.index(case)
+                for future in as_completed(futures):
+                    if future.cancelled():
+                        continue
+                    results_data[futures[future]] = future.result()
+                    completed += 1
+                    self.progress_update.emit(int((completed / total_cases) * 100))
                     if not self.running:
-                        break
-                    
-                    status = task['process'].returncode
-                    
-                    report_info = self.run_one_report(task['case'], task['dev'], log_base_dir)
-        
-                    report_info['status'] = status if status is not None else -1
-                    case_results['tests'][task['dev']] = report_info
-                
-                results_data.append(case_results)
-                self.progress_update.emit(int(((i + 1) / total_cases) * 100))
+                        for pending in futures:
+                            pending.cancel()
+            results_data = [dt for dt in results_data if dt is not None]
 
             if self.running:
+                self.status_update.emit("正在等待报告生成完成...")
+                self.join_reports()
                 self.progress_update.emit(100)
                 report_path = self.run_summary(results_data, self.settings['start_time'])
+                self.events.emit("run_finished", duration=round(time.time() - self.settings['start_time'], 3))
                 self.status_update.emit("所有脚本运行完毕")
                 self.finished.emit(report_path)
             else:
+                self.events.emit("run_stopped", completed=completed)
                 self.status_update.emit("运行已停止")
                 self.finished.emit("")
         except Exception as e:
+            self.events.emit("run_failed", error=str(e))
             self.status_update.emit(f"发生错误: {e}")
             traceback.print_exc()
             self.finished.emit("")
+        finally:
+            if self.metrics_exporter:
+                self.metrics_exporter.stop()
+            self.events.close()
+            if self.report_executor:
+                self.report_executor.shutdown(wait=False, cancel_futures=True)
+            if self.report_renderer:
+                self.report_renderer.shutdown()
+            if self.warm_pool:
+                self.warm_pool.shutdown()
+            release_run(self.report_dir)
+
+    def _emit_eta(self):
+        """ 根据历史耗时估计剩余时间并通知界面。"""
+        with self.state_lock:
+            pending = list(self.pending_cases)
+            running = dict(self.running_cases)
+        self.eta_update.emit(self.timing_store.eta(pending, running, self.max_workers, time.time()))
+
+    def join_reports(self):
+        """ 等待所有排队中的报告生成完毕，并把结果写回对应用例的数据。"""
+        for tests, dev, future in self.pending_reports:
+            try:
+                # 报告结果只提供路径和耗时，用例状态以进程退出码为准
+                report_info = future.result()
+                report_info.pop('status', None)
+                tests[dev].update(report_info)
+            except Exception:
+                traceback.print_exc()
+        self.pending_reports.clear()
+
+    def queue_report(self, tests, case, dev, status, log_base_dir):
+        """ 先写入带状态的占位结果，再把报告生成任务放入后台队列。"""
+        tests[dev] = {'status': status if status is not None else -1, 'path': ''}
+        future = self.report_executor.submit(self.report_and_record, case, dev, tests[dev]['status'], log_base_dir)
+        self.pending_reports.append((tests, dev, future))
+
+    def report_and_record(self, case, dev, status, log_base_dir):
+        """ 生成报告后把用例结果追加到检查点日志。"""
+        report_info = self.run_one_report(case, dev, log_base_dir)
+        test = {key: value for key, value in report_info.items() if key != 'status'}
+        test['status'] = status
+        self.journal.record(case, {dev: test})
+        self.events.emit("report_rendered", case=case, device=dev, ok=report_info.get('status') == 0,
+                         path=report_info.get('path', ''), report_time=report_info.get('report_time'))
+        return report_info
+
+    def run_case(self, index, case, log_base_dir):
+        """ 在工作线程中执行单个用例并将报告生成排入队列，返回该用例的结果数据。"""
+        case_results = {'script': case, 'tests': {}}
+        if not self.running:
+            return case_results
+
+        requires = get_case_index().get_requires(case)
+        if not self.device_registry.is_satisfiable(requires):
+            self.status_update.emit(f"没有满足 {case} 要求 {requires} 的设备，已跳过")
+            case_results['tests']['no_device'] = {'status': -1, 'path': ''}
+            self.journal.record(case, case_results['tests'])
+            self.events.emit("case_finished", case=case, device=None, status=-1, duration=0, reason="no_device")
+            with self.state_lock:
+                self.pending_cases.discard(case)
+            return case_results
+
+        # 租用一台空闲且能力匹配的设备，用例结束后归还
+        device = self.device_registry.lease(requires, should_continue=lambda: self.running)
+        if device is None:
+            return case_results
+        # 设备空闲后还需要系统资源允许，才真正启动用例
+        if not self.admission.admit(
+                should_continue=lambda: self.running,
+                on_wait=lambda reason: self.status_update.emit(f"系统资源紧张({reason})，{case} 等待执行")):
+            self.device_registry.release(device)
+            return case_results
+        tasks = []
+        try:
+            self.status_update.emit(f"正在运行: {case} @ {device.name} ({index+1}/{len(self.cases)})")
+            start_time = time.time()
+            with self.state_lock:
+                self.pending_cases.discard(case)
+                self.running_cases[case] = start_time
+            self._emit_eta()
+            self.events.emit("case_started", case=case, device=device.name)
+
+            tasks = self.run_on_devices(case, [device], log_base_dir)
+
+            for task in tasks:
+                if not self.running:
+                    break
+                # 等待进程结束，同时检查是否需要手动停止；超出时长预算或长时间无输出时由看门狗结束
+                watchdog = CaseWatchdog(task['process'], task['log_dir'], task['console'], *task['budget'])
+                status = watchdog.wait(should_continue=lambda: self.running)
+                if not self.running:
+                    break
+                if watchdog.reason:
+                    self.status_update.emit(f"{case} 触发看门狗({watchdog.reason})，已结束并保存诊断信息")
+
+                finish_console(task['console'], task.get('reader'))
+                duration = time.time() - start_time
+                self.timing_store.record(case, duration, status)
+                self.events.emit("case_finished", case=case, device=task['dev'], status=status,
+                                 duration=round(duration, 3), reason=watchdog.reason)
+                # 报告不需要占用设备，交给后台报告线程，设备可以立即开始下一个用例
+                self.queue_report(case_results['tests'], task['case'], task['dev'], status, log_base_dir)
+        finally:
+            # 读取线程会在输出结束时自行关闭 console，预热进程的 console 需要在这里关闭
+            for task in tasks:
+                if task.get('reader') is None:
+                    task['console'].close()
+            self.admission.release()
+            self.device_registry.release(device)
+            with self.state_lock:
+                self.running_cases.pop(case, None)
+            self._emit_eta()
+        return case_results
+
+    def _stream_line(self, case, line):
+        """ 用例输出行的回调，写入实时日志缓冲区。"""
+        if self.running:
+            self.log_buffer.append(case, line.strip())
 
     def run_on_devices(self, case, devices, log_base_dir):
-        """ 为单个用例启动一个或多个Airtest子进程。"""
+        """ 为单个用例在租用到的设备上启动一个或多个Airtest子进程。"""
         tasks = []
-        env = os.environ.copy()
-        env['PROJECT_ROOT'] = os.getcwd()
-        # Force unbuffered output for the Python-based subprocess (airtest).
-        # This ensures logs are sent line-by-line in real-time.
-        env['PYTHONUNBUFFERED'] = "1"
+        base_env = self._get_base_env()
         
         case_name = os.path.splitext(case)[0]
         case_path = os.path.join(os.getcwd(), "case", case, f"{case_name}.py")
-        for dev in devices:
+        budget = get_case_budget(self.settings, get_case_index().get_timeout(case))
+        for device in devices:
+            dev = device.name
             log_dir = get_log_dir(case, dev, log_base_dir)
+            # 启用看门狗时让用例进程监听诊断请求，卡死时可以输出调用栈和截图
+            task_env = get_watchdog_env(log_dir) if any(budget) else {}
+            # 截图写入运行目录下共享的 artifacts，相同的画面在各用例之间只保存一次
+            task_env.update(get_artifact_env(self.report_dir))
+            env = device.to_env(dict(base_env, **task_env))
             cmd = ["airtest", "run", case_path, "--log", log_dir, "--recording"]
             
             try:
+                # 控制台输出同时写入日志目录下的 console.log，用例结束后仍可查看
+                console = ConsoleWriter(log_dir)
+                with self.state_lock:
+                    self.console_dirs.setdefault(case, []).append((dev, log_dir))
+                if self.warm_pool:
+                    def on_output(line, case=case, console=console):
+                        console.write(line)
+                        self._stream_line(case, line)
+
+                    # 预热进程只需要设备配置，其余环境变量在进程启动时已经设置
+                    process = self.warm_pool.submit(case_path, log_dir, env=device.to_env(task_env),
+                                                    on_output=on_output)
+                    self.process_list.append(process)
+                    tasks.append({'process': process, 'dev': dev, 'case': case, 'console': console,
+                                  'log_dir': log_dir, 'budget': budget})
+                    continue
+
                 is_windows = (os.name == 'nt')
                 creation_flags = subprocess.CREATE_NO_WINDOW if is_windows else 0
                 
@@ -486,24 +710,21 @@ class RunnerThread(QThread):
                     env=env,
                     cwd=os.getcwd(),
                     shell=is_windows,
-                    creationflags=creation_flags,
+                    **get_process_group_kwargs(creation_flags),
                     stdout=subprocess.PIPE,
                     stderr=subprocess.STDOUT,
                     text=True,
-                    encoding='gbk',
+                    encoding=locale.getpreferredencoding(False),
                     errors='replace',
                     bufsize=1
                 )
 
-                output_thread = threading.Thread(
-                    target=self._stream_reader,
-                    args=(process.stdout,),
-                    daemon=True
-                )
-                output_thread.start()
+                output_thread = start_console_reader(
+                    process.stdout, console, on_line=lambda line, case=case: self._stream_line(case, line))
 
                 self.process_list.append(process)
-                tasks.append({'process': process, 'dev': dev, 'case': case})
+                tasks.append({'process': process, 'dev': dev, 'case': case, 'console': console,
+                              'reader': output_thread, 'log_dir': log_dir, 'budget': budget})
             except Exception:
                 traceback.print_exc()
         return tasks
@@ -534,27 +755,11 @@ class RunnerThread(QThread):
         
         try:
             report_path = os.path.join(log_dir, 'log.html')
-            static_source_path = os.path.join(os.getcwd(), "source")
-            cmd = [
-                "airtest", "report", case_path,
-                "--log_root", log_dir,
-                "--outfile", report_path,
-                "--static_root", static_source_path,
-                "--lang", "zh",
-                "--plugin", "tp_airtest_selenium.report"
-            ]
-            is_windows = (os.name == 'nt')
-            report_process = subprocess.Popen(
-                cmd,
-                shell=is_windows,
-                cwd=os.getcwd(),
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE
-            )
-            report_process.communicate(timeout=60)
+            report_time = self.report_renderer.render(case_path, log_dir, report_path)
+            self.log_buffer.append(case, f"报告生成完成: {case} 耗时 {report_time:.2f}s")
             
             relative_path =  os.path.relpath(report_path, self.report_dir).replace('\\', '/')
-            return {'status': 0, 'path': relative_path}
+            return {'status': 0, 'path': relative_path, 'report_time': round(report_time, 3)}
         except Exception:
             traceback.print_exc()
             return {'status': -1, 'path': ''}
@@ -574,14 +779,11 @@ class RunnerThread(QThread):
             for dt in data:
                 dt['description'] = get_script_description(dt['script'])
 
-            template_dir = os.path.join(os.getcwd(), "source")
-            env = Environment(loader=FileSystemLoader(template_dir), trim_blocks=True)
-            template = env.get_template('template.html')
-            html = template.render(data=summary)
-
-            report_path = os.path.join(self.report_dir, "result.html")
-            with open(report_path, "w", encoding="utf-8") as f:
-                f.write(html)
+            # 用例结果写入 result_data.js，result.html 只是按页渲染的页面框架
+            report_path = render_summary(self.report_dir, summary)
+            write_latest_pointer(self.result_root, self.report_dir)
+            self.events.emit("summary_written", path=report_path, success=summary['success'],
+                             count=summary['count'], duration=float(summary['time']))
             
             return 'file:///' + os.path.realpath(report_path).replace('\\', '/')
         except Exception:
@@ -589,22 +791,25 @@ class RunnerThread(QThread):
             return ""
 
     def stop(self):
-        """ 停止线程和所有由它创建的子进程。"""
+        """ 停止线程，并在后台结束所有由它创建的子进程，避免等待进程退出时阻塞界面。"""
         self.running = False
-        
-        for p in self.process_list:
-            if p.poll() is None:
-                try:
-                    subprocess.run(
-                        f"taskkill /F /T /PID {p.pid}",
-                        check=True,
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.PIPE,
-                        creationflags=subprocess.CREATE_NO_WINDOW
-                    )
-                except (subprocess.CalledProcessError, psutil.NoSuchProcess, ProcessLookupError):
-                    pass
-        self.process_list.clear()
+        processes, self.process_list = self.process_list, []
+        pids = [p.pid for p in processes if p.poll() is None]
+        if pids:
+            threading.Thread(target=self._teardown, args=(pids,), daemon=True).start()
+
+    def _teardown(self, pids):
+        """ 先请求各进程组正常退出，超时后强制结束，并确认没有残留的驱动和浏览器进程。"""
+        try:
+            result = teardown_processes(pids, grace=float(self.settings.get("teardown_grace", 5) or 0))
+        except Exception as e:
+            self.status_update.emit(f"结束子进程失败: {e}")
+            return
+        message = f"已结束 {result['count']} 个子进程，耗时 {result['elapsed']:.2f}s"
+        if result['survivors']:
+            message += "，仍有残留: " + ", ".join(f"{name}({pid})" for pid, name in result['survivors'])
+        self.log_buffer.append(ALL_CASES, message)
+        self.status_update.emit(message)
 
 # =====================================================================================================================
 #  设置对话框
@@ -729,10 +934,13 @@ class App(QWidget):
         self.runner_thread = None
         self.port_check_thread = None
         self.start_time = 0
+        self.eta_end = 0
         self.MAIN_UI_KEYS = OtherSettingsPage.MAIN_UI_KEYS
 
         self.execution_timer = QTimer(self)
         self.execution_timer.timeout.connect(self.update_execution_time)
+        self.log_flush_timer = QTimer(self)
+        self.log_flush_timer.timeout.connect(self.flush_logs)
         
         self.setup_ui()
         self.load_settings()
@@ -1049,11 +1257,36 @@ class App(QWidget):
         status_layout.addWidget(self.progress_bar, 1)
         control_layout.addLayout(status_layout)
 
+        self.log_row = QWidget()
+        log_row_layout = QHBoxLayout(self.log_row)
+        log_row_layout.setContentsMargins(0, 0, 0, 0)
         self.log_label = QLineEdit()
         self.log_label.setReadOnly(True)
         self.log_label.setPlaceholderText("等待实时日志输出...")
-        self.log_label.setVisible(False)
-        control_layout.addWidget(self.log_label)
+        log_row_layout.addWidget(self.log_label, 1)
+        self.log_case_combo = QComboBox()
+        self.log_case_combo.setMinimumWidth(160)
+        log_row_layout.addWidget(self.log_case_combo)
+        self.log_window_combo = QComboBox()
+        for seconds, label in CONSOLE_WINDOWS:
+            self.log_window_combo.addItem(label, seconds)
+        log_row_layout.addWidget(self.log_window_combo)
+        self.log_toggle_button = QPushButton("展开日志")
+        self.log_toggle_button.setCheckable(True)
+        log_row_layout.addWidget(self.log_toggle_button)
+        self.log_row.setVisible(False)
+        control_layout.addWidget(self.log_row)
+
+        # QListView 只绘制可见的行，即使保留数千行日志也不会拖慢界面
+        self.log_model = LogListModel(parent=self)
+        self.log_view = QListView()
+        self.log_view.setModel(self.log_model)
+        self.log_view.setUniformItemSizes(True)
+        self.log_view.setFont(QFontDatabase.systemFont(QFontDatabase.SystemFont.FixedFont))
+        self.log_view.setEditTriggers(QListView.EditTrigger.NoEditTriggers)
+        self.log_view.setFixedHeight(180)
+        self.log_view.setVisible(False)
+        control_layout.addWidget(self.log_view)
 
         self.action_button = QPushButton("开始执行")
         control_layout.addWidget(self.action_button)
@@ -1075,6 +1308,9 @@ class App(QWidget):
         self.search_scripts_entry.textChanged.connect(self.filter_scripts)
         self.select_all_checkbox.stateChanged.connect(self.toggle_select_all)
         self.action_button.clicked.connect(self.toggle_runner)
+        self.log_toggle_button.toggled.connect(self.toggle_log_view)
+        self.log_case_combo.currentIndexChanged.connect(self.on_log_case_changed)
+        self.log_window_combo.currentIndexChanged.connect(self.on_log_case_changed)
 
     def on_page_changed(self, index):
         """ 当页面切换时，改变参数按钮的图标和提示。"""
@@ -1129,16 +1365,87 @@ class App(QWidget):
     def update_execution_time(self):
         """ 更新执行计时器标签。"""
         if self.start_time > 0:
-            elapsed_seconds = int(time.time() - self.start_time)
-            hours, remainder = divmod(elapsed_seconds, 3600)
-            minutes, seconds = divmod(remainder, 60)
-            self.timer_label.setText(f"执行时间: {hours:02}:{minutes:02}:{seconds:02}")
-
-    def update_log_label(self, log_line):
-        """更新UI上的实时日志行。"""
-        self.log_label.setText(log_line)
+            text = f"执行时间: {self._format_seconds(time.time() - self.start_time)}"
+            if self.eta_end > 0:
+                text += f"  预计剩余: {self._format_seconds(max(0, self.eta_end - time.time()))}"
+            self.timer_label.setText(text)
+
+    @staticmethod
+    def _format_seconds(total_seconds):
+        """ 将秒数格式化为 HH:MM:SS。"""
+        hours, remainder = divmod(int(total_seconds), 3600)
+        minutes, seconds = divmod(remainder, 60)
+        return f"{hours:02}:{minutes:02}:{seconds:02}"
+
+    def update_eta(self, remaining_seconds):
+        """ 根据执行线程基于历史耗时估计的剩余时间更新预计完成时刻。"""
+        self.eta_end = time.time() + remaining_seconds
+        self.update_execution_time()
+
+    def flush_logs(self):
+        """ 定时从执行线程的日志缓冲区批量取出新增的行，更新实时日志行和日志面板。"""
+        if not self.runner_thread:
+            return
+        log_buffer = self.runner_thread.log_buffer
+        batch, dropped = log_buffer.drain()
+        if not batch:
+            return
+
+        known = {self.log_case_combo.itemData(i) for i in range(self.log_case_combo.count())}
+        for case in log_buffer.get_cases():
+            if case not in known:
+                self.log_case_combo.addItem(case, case)
+
+        selected = self.log_case_combo.currentData()
+        if selected == ALL_CASES:
+            lines = [format_line(case, line) for case, line in batch]
+        else:
+            lines = [line for case, line in batch if case == selected]
+        if dropped:
+            lines.insert(0, f"... 日志输出过快，已省略 {dropped} 行 ...")
+
+        # 查看历史时间窗口时面板内容保持不变，只更新实时日志行
+        if not self.log_window_combo.currentData():
+            scroll_bar = self.log_view.verticalScrollBar()
+            at_bottom = scroll_bar.value() >= scroll_bar.maximum()
+            self.log_model.append_lines(lines)
+            if at_bottom:
+                self.log_view.scrollToBottom()
+
+        self.log_label.setText(format_line(*batch[-1]))
         self.log_label.setCursorPosition(0)
 
+    def toggle_log_view(self, checked):
+        """ 展开或收起日志面板。"""
+        self.log_view.setVisible(checked)
+        self.log_toggle_button.setText("收起日志" if checked else "展开日志")
+        if checked:
+            self.log_view.scrollToBottom()
+
+    def on_log_case_changed(self, index):
+        """
+        切换查看的用例或时间窗口时重新载入日志面板：实时视图从缓冲区载入保留的行，
+        时间窗口视图借助 console.idx 只读取各用例 console.log 中该窗口内的部分。
+        """
+        if index < 0 or not self.runner_thread:
+            return
+        case = self.log_case_combo.currentData()
+        window = self.log_window_combo.currentData()
+        if not window:
+            self.log_model.set_lines(self.runner_thread.log_buffer.get_lines(case))
+        else:
+            start = time.time() - window
+            with self.runner_thread.state_lock:
+                console_dirs = {name: list(dirs) for name, dirs in self.runner_thread.console_dirs.items()
+                                if case == ALL_CASES or name == case}
+            lines = []
+            for name, dirs in console_dirs.items():
+                for dev, log_dir in dirs:
+                    prefix = f"{name} @ {dev}" if case == ALL_CASES else (dev if len(dirs) > 1 else "")
+                    lines.extend(format_line(prefix, line) for line in read_console(log_dir, start=start))
+            self.log_model.set_lines(lines)
+        self.log_view.scrollToBottom()
+
     def load_settings(self):
         """ 从 setting.json 加载设置。"""
         if os.path.exists(self.settings_path):
@@ -1313,6 +1620,7 @@ class App(QWidget):
         self.progress_bar.setVisible(True)
         self.progress_bar.setValue(0)
         self.start_time = start_timestamp
+        self.eta_end = 0
         self.timer_label.setText("执行时间: 00:00:00")
         self.timer_label.setVisible(True)
         self.execution_timer.start(1000)
@@ -1320,14 +1628,24 @@ class App(QWidget):
         self.progress_bar.setValue(1)
         
         self.log_label.clear()
-        self.log_label.setVisible(True)
+        self.log_row.setVisible(True)
 
         self.runner_thread = RunnerThread(selected_cases, current_settings)
         self.runner_thread.status_update.connect(self.status_label.setText)
         self.runner_thread.progress_update.connect(self.progress_bar.setValue)
         self.runner_thread.finished.connect(self.on_runner_finished)
-        self.runner_thread.log_update.connect(self.update_log_label)
+        self.runner_thread.eta_update.connect(self.update_eta)
+        self.log_model.max_lines = self.runner_thread.log_buffer.max_lines
+        self.log_model.set_lines([])
+        self.log_case_combo.blockSignals(True)
+        self.log_case_combo.clear()
+        self.log_case_combo.addItem("全部用例", ALL_CASES)
+        self.log_case_combo.blockSignals(False)
+        self.log_window_combo.blockSignals(True)
+        self.log_window_combo.setCurrentIndex(0)
+        self.log_window_combo.blockSignals(False)
         self.runner_thread.start()
+        self.log_flush_timer.start(LOG_FLUSH_INTERVAL)
 
     def stop_runner(self):
         """ 停止正在运行的测试。"""
@@ -1345,8 +1663,11 @@ class App(QWidget):
         self.action_button.setEnabled(True)
         self.execution_timer.stop()
         self.progress_bar.setVisible(False)
-        self.log_label.setVisible(False)
+        # 取走剩余的日志后停止刷新，日志面板保留本次运行的输出供查看
+        self.flush_logs()
+        self.log_flush_timer.stop()
         self.start_time = 0
+        self.eta_end = 0
         if report_path:
             webbrowser.open(report_path)
 
@@ -1387,6 +1708,8 @@ def is_admin():
         return False
 
 if __name__ == '__main__':
+    # 报告进程池在打包后的程序中需要此调用才能正常启动子进程
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     window = App()
     window.show()
@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+# Airtest-Runner/warm_worker.py
+"""
+常驻(预热)的用例执行进程。
+
+作为脚本运行时，它会先导入 tp_airtest_selenium.proxy 及其依赖(selenium、cv2、numpy、airtest 等)，
+然后从标准输入逐行读取 JSON 格式的任务，每个任务等价于一次
+`airtest run <script> --log <log_dir> --recording`，执行结束后输出一行完成标记和退出码。
+
+作为模块导入时，WarmWorkerPool 负责启动和复用这些进程，提交任务后返回一个与 subprocess.Popen
+用法一致的 WarmJob，执行器可以像等待普通子进程一样等待它。
+"""
+import os
+import sys
+import json
+import queue
+import threading
+import traceback
+import subprocess
+
+from watchdog_utils import get_process_group_kwargs
+
+DONE_MARKER = "__WARM_WORKER_DONE__"
+
+
+# =====================================================================================================================
+#  执行器一侧: 进程池与任务句柄
+# =====================================================================================================================
+class WarmJob:
+    """ 提交给预热进程的单个用例，提供与 subprocess.Popen 一致的 poll/wait/terminate 接口。"""
+    def __init__(self, worker, on_output=None):
+        self.worker = worker
+        self.on_output = on_output
+        self.pid = worker.process.pid
+        self.returncode = None
+        self.done = threading.Event()
+
+    def _finish(self, status):
+        self.returncode = status
+        self.done.set()
+
+    def poll(self):
+        return self.returncode
+
+    def wait(self, timeout=None):
+        self.done.wait(timeout)
+        return self.returncode
+
+    def terminate(self):
+        """ 用例无法在进程内中断，只能结束整个预热进程，进程池会在下次取用时补充新的进程。"""
+        self.worker.kill()
+
+    kill = terminate
+
+
+class WarmWorker:
+    def __init__(self, python, env=None, cwd=None, on_output=None, on_idle=None):
+        """
+        启动一个预热进程。
+
+        Args:
+            python (str): 用于启动预热进程的 Python 解释器.
+            env (dict): 进程环境变量.
+            cwd (str): 进程工作目录.
+            on_output (callable): 接收用例输出行的回调，为 None 时直接打印.
+            on_idle (callable): 用例正常结束、进程可以复用时的回调.
+        """
+        env = dict(env if env is not None else os.environ)
+        env['PYTHONUNBUFFERED'] = "1"
+        env['PYTHONIOENCODING'] = "utf-8"
+        is_windows = (os.name == 'nt')
+        self.on_output = on_output or print
+        self.on_idle = on_idle
+        self.job = None
+        self.lock = threading.Lock()
+        self.process = subprocess.Popen(
+            [python, os.path.abspath(__file__)],
+            env=env,
+            cwd=cwd or os.getcwd(),
+            # 与普通用例进程一样在独立的进程组/会话中启动，停止时可以连同它启动的驱动和浏览器一起结束
+            **get_process_group_kwargs(subprocess.CREATE_NO_WINDOW if is_windows else 0),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            encoding='utf-8',
+            errors='replace',
+            bufsize=1
+        )
+        self.reader = threading.Thread(target=self._read_output, daemon=True)
+        self.reader.start()
+
+    def _read_output(self):
+        """ 读取进程输出，识别任务完成标记，其余行交给 on_output。"""
+        for line in iter(self.process.stdout.readline, ''):
+            line = line.rstrip('\r\n')
+            if line.startswith(DONE_MARKER):
+                try:
+                    status = int(line[len(DONE_MARKER):].strip())
+                except ValueError:
+                    status = -1
+                self._finish_job(status, reusable=True)
+            else:
+                job = self.job
+                (job.on_output if job is not None and job.on_output else self.on_output)(line)
+        self.process.stdout.close()
+        # 进程退出(崩溃或被结束)时，未完成的任务以进程退出码结束
+        self.process.wait()
+        self._finish_job(self.process.returncode if self.process.returncode else -1)
+
+    def _finish_job(self, status, reusable=False):
+        with self.lock:
+            job, self.job = self.job, None
+        # 先归还进程再通知任务结束，保证下一个用例能立即取到这个进程
+        if reusable and self.on_idle is not None and self.is_alive():
+            self.on_idle(self)
+        if job is not None:
+            job._finish(status)
+
+    def is_alive(self):
+        return self.process.poll() is None
+
+    def submit(self, script, log_dir, env=None, recording=True, on_output=None):
+        """ 在该进程中执行一个用例，返回 WarmJob。on_output 用于单独接收该用例的输出行。"""
+        job = WarmJob(self, on_output)
+        with self.lock:
+            if self.job is not None:
+                raise RuntimeError("预热进程正在执行其他用例")
+            self.job = job
+        task = {"script": script, "log": log_dir, "recording": recording, "env": env or {}}
+        try:
+            self.process.stdin.write(json.dumps(task, ensure_ascii=False) + "\n")
+            self.process.stdin.flush()
+        except (OSError, ValueError):
+            self._finish_job(-1)
+        return job
+
+    def kill(self):
+        if self.is_alive():
+            self.process.kill()
+
+    def close(self):
+        """ 关闭标准输入让进程自然退出，超时则强制结束。"""
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout=5)
+        except (OSError, ValueError, subprocess.TimeoutExpired):
+            self.kill()
+
+
+class WarmWorkerPool:
+    def __init__(self, size, python=None, env=None, cwd=None, on_output=None):
+        """
+        预热进程池。进程在首次取用时启动并在用例之间复用，异常退出的进程会被自动替换。
+        """
+        self.size = max(1, int(size or 1))
+        self.python = python or get_default_python()
+        self.env = env
+        self.cwd = cwd
+        self.on_output = on_output
+        self.idle = queue.Queue()
+        self.workers = []
+        self.lock = threading.Lock()
+
+    def _spawn(self):
+        worker = WarmWorker(self.python, env=self.env, cwd=self.cwd,
+                            on_output=self.on_output, on_idle=self.idle.put)
+        with self.lock:
+            self.workers.append(worker)
+        return worker
+
+    def start(self):
+        """ 提前启动全部进程，让导入开销发生在第一个用例开始之前。"""
+        for _ in range(self.size):
+            self.idle.put(self._spawn())
+
+    def submit(self, script, log_dir, env=None, recording=True, on_output=None):
+        """ 取一个空闲进程执行用例；用例结束后进程自动归还到空闲队列，已退出的进程会被替换。"""
+        while True:
+            try:
+                worker = self.idle.get_nowait()
+            except queue.Empty:
+                worker = self._spawn()
+            if worker.is_alive():
+                break
+            with self.lock:
+                if worker in self.workers:
+                    self.workers.remove(worker)
+        return worker.submit(script, log_dir, env=env, recording=recording, on_output=on_output)
+
+    def shutdown(self):
+        """ 关闭全部预热进程。"""
+        with self.lock:
+            workers, self.workers = self.workers, []
+        for worker in workers:
+            worker.close()
+
+
+def get_default_python():
+    """ 打包后的程序没有可用的解释器，使用 PATH 中的 python；否则使用当前解释器。"""
+    if getattr(sys, "frozen", False):
+        return "python"
+    return sys.executable
+
+
+# =====================================================================================================================
+#  预热进程一侧: 预导入依赖并循环执行任务
+# =====================================================================================================================
+def _reset_airtest_globals(st_defaults):
+    """ 清理上一个用例留下的 airtest 全局状态(G/ST)，保证每个用例都像在新进程中运行。"""
+    from airtest.core.helper import G
+    from airtest.core.settings import Settings as ST
+
+    for key, value in st_defaults.items():
+        setattr(ST, key, value)
+    G.DEVICE = None
+    G.DEVICE_LIST = []
+    G.BASEDIR = []
+    G.LOGGER.set_logfile(None)
+    G.LOGGER.running_stack = []
+    for attr in ("_extra_log_data", "_extra_traceback_data"):
+        if hasattr(G.LOGGER, attr):
+            delattr(G.LOGGER, attr)
+
+
+def _run_task(task, st_defaults, base_environ, base_sys_path):
+    """ 执行单个任务，返回与 `airtest run` 一致的退出码。"""
+    from airtest.cli.parser import get_parser
+    from airtest.cli.runner import run_script
+
+    os.environ.clear()
+    os.environ.update(base_environ)
+    os.environ.update(task.get("env") or {})
+    sys.path[:] = base_sys_path
+    _reset_airtest_globals(st_defaults)
+
+    argv = ["run", task["script"], "--log", task["log"]]
+    if task.get("recording"):
+        argv.append("--recording")
+    try:
+        run_script(get_parser().parse_args(argv))
+    except SystemExit as e:
+        return e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except Exception:
+        traceback.print_exc()
+        return 1
+    return 0
+
+
+def main():
+    # 预导入完整的依赖栈，这正是预热进程要节省的开销
+    import tp_airtest_selenium.proxy  # noqa: F401
+    import airtest.core.api  # noqa: F401
+    import airtest.cli.runner  # noqa: F401
+    from airtest.core.settings import Settings as ST
+    from tp_airtest_selenium.utils.watchdog import start_watchdog_listener
+    from tp_airtest_selenium.utils.artifact_store import flush_artifacts
+
+    # 看门狗的诊断目录随每个任务的环境变量变化，监听线程在进程内只需启动一次
+    start_watchdog_listener()
+
+    st_defaults = {key: value for key, value in vars(ST).items() if key.isupper()}
+    base_environ = dict(os.environ)
+    base_sys_path = list(sys.path)
+
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            status = _run_task(json.loads(line), st_defaults, base_environ, base_sys_path)
+        except Exception:
+            traceback.print_exc()
+            status = 1
+        # 进程不退出，用例结束时主动等待后台写入的截图全部落盘，再通知执行器生成报告
+        flush_artifacts()
+        sys.stdout.flush()
+        print(f"{DONE_MARKER} {status}", flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+# Airtest-Runner/watchdog_utils.py
+
+import os
+import time
+import json
+import signal
+import subprocess
+
+import psutil
+
+# 与 tp_airtest_selenium/utils/watchdog.py 中的约定保持一致
+WATCHDOG_ENV_KEY = "AIRTEST_WATCHDOG_DIR"
+REQUEST_FILE = "watchdog.request"
+DONE_FILE = "watchdog.done"
+REPORT_FILE = "watchdog.json"
+
+# 被看门狗结束的用例使用的状态码
+TIMEOUT_STATUS = -2
+# 等待用例进程输出调用栈和截图的最长时间(秒)
+DIAGNOSTICS_TIMEOUT = 10
+# 检查 log.txt 大小的间隔(秒)
+LOG_CHECK_INTERVAL = 1.0
+# 停止运行时等待进程自行退出的时间(秒)，超时后强制结束
+TEARDOWN_GRACE = 5.0
+# 清理后需要确认已经退出的驱动和浏览器进程
+BROWSER_PROCESS_NAMES = ("chromedriver", "chrome", "msedgedriver", "msedge", "geckodriver", "firefox")
+
+IS_WINDOWS = (os.name == 'nt')
+
+
+def get_process_group_kwargs(creationflags=0):
+    """
+    让子进程在独立的进程组(Windows)或会话(Linux/MacOS)中启动的 Popen 参数，
+    停止时可以连同 chromedriver、浏览器等子孙进程一起结束。
+    """
+    if IS_WINDOWS:
+        return {"creationflags": creationflags | subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {"creationflags": creationflags, "start_new_session": True}
+
+
+def _snapshot(pids):
+    """ 在结束之前记录进程树，进程退出后其子进程会被过继，之后就无法再从父进程找到它们。"""
+    processes = {}
+    for pid in pids:
+        try:
+            parent = psutil.Process(pid)
+            for process in [parent] + parent.children(recursive=True):
+                processes[process.pid] = process
+        except psutil.NoSuchProcess:
+            pass
+    return processes
+
+
+def _signal_groups(pids, graceful):
+    """
+    向以 pids 为首的进程组发送 SIGTERM / SIGKILL。
+    Windows 上用例进程没有控制台，无法接收 CTRL_BREAK_EVENT，只依赖进程树快照逐个结束。
+    """
+    if IS_WINDOWS:
+        return
+    for pid in pids:
+        try:
+            if os.getpgid(pid) == pid:
+                os.killpg(pid, signal.SIGTERM if graceful else signal.SIGKILL)
+        except OSError:
+            pass
+
+
+def _is_browser(process):
+    try:
+        name = process.name().lower()
+    except (psutil.NoSuchProcess, psutil.AccessDenied):
+        return False
+    return any(name.startswith(browser) for browser in BROWSER_PROCESS_NAMES)
+
+
+def teardown_processes(pids, grace=TEARDOWN_GRACE):
+    """
+    结束一组用例进程及其全部子孙进程：先请求进程组正常退出，超过 grace 秒后强制结束，
+    最后通过 psutil 确认没有残留的 chromedriver 或浏览器进程。
+
+    Returns:
+        dict: {'elapsed': 耗时(秒), 'count': 涉及的进程数, 'survivors': 仍然存活的进程 [(pid, 名称)]}
+    """
+    start = time.time()
+    pids = [pid for pid in pids if pid]
+    processes = _snapshot(pids)
+    groups = set(pids)
+
+    if grace > 0:
+        _signal_groups(pids, graceful=True)
+        for process in processes.values():
+            try:
+                process.terminate()
+            except psutil.NoSuchProcess:
+                pass
+        _, alive = psutil.wait_procs(list(processes.values()), timeout=grace)
+    else:
+        alive = list(processes.values())
+
+    if alive:
+        _signal_groups(pids, graceful=False)
+        for process in alive:
+            try:
+                process.kill()
+            except psutil.NoSuchProcess:
+                pass
+        _, alive = psutil.wait_procs(alive, timeout=2)
+
+    # 浏览器可能已经脱离原来的进程树(被过继)，再按进程组检查一遍同名的残留进程
+    if not IS_WINDOWS and groups:
+        for process in psutil.process_iter():
+            if process.pid in processes or not _is_browser(process):
+                continue
+            try:
+                if os.getpgid(process.pid) in groups:
+                    process.kill()
+                    alive.append(process)
+            except (OSError, psutil.NoSuchProcess):
+                pass
+        _, alive = psutil.wait_procs(alive, timeout=2)
+
+    survivors = []
+    for process in alive:
+        try:
+            survivors.append((process.pid, process.name()))
+        except psutil.NoSuchProcess:
+            pass
+    return {"elapsed": time.time() - start, "count": len(processes), "survivors": survivors}
+
+
+def kill_process_tree(pid, timeout=5):
+    """ 立即结束进程及其所有子孙进程(chromedriver、浏览器等)，返回未能结束的进程列表 [(pid, 名称)]。"""
+    return teardown_processes([pid], grace=0)["survivors"]
+
+
+class CaseWatchdog:
+    def __init__(self, process, log_dir, console=None, timeout=0, idle_timeout=0):
+        """
+        单个用例进程的看门狗：超过总时长预算，或者在 idle_timeout 秒内既没有控制台输出、
+        log.txt 也没有增长时触发，收集诊断信息后结束整个进程树。
+
+        Args:
+            process: subprocess.Popen 或 WarmJob.
+            log_dir (str): 用例的日志目录，诊断文件也写在这里.
+            console (ConsoleWriter): 用例的控制台输出，用于判断是否仍有输出.
+            timeout (float): 总时长预算(秒)，0 表示不限制.
+            idle_timeout (float): 无活动超时(秒)，0 表示不检查.
+        """
+        self.process = process
+        self.log_dir = log_dir
+        self.console = console
+        self.timeout = float(timeout or 0)
+        self.idle_timeout = float(idle_timeout or 0)
+        self.start_time = time.time()
+        self.last_activity = self.start_time
+        self.log_txt = os.path.join(log_dir, "log.txt")
+        self.log_size = -1
+        self.last_log_check = 0
+        self.reason = None
+
+    @property
+    def enabled(self):
+        return self.timeout > 0 or self.idle_timeout > 0
+
+    def _update_activity(self, now):
+        if self.console is not None and self.console.last_write:
+            self.last_activity = max(self.last_activity, self.console.last_write)
+        if now - self.last_log_check >= LOG_CHECK_INTERVAL:
+            self.last_log_check = now
+            try:
+                size = os.path.getsize(self.log_txt)
+            except OSError:
+                size = -1
+            if size != self.log_size:
+                self.log_size = size
+                self.last_activity = now
+
+    def check(self, now=None):
+        """ 检查是否需要触发，返回触发原因 'timeout' / 'idle'，未触发时返回 None。"""
+        if not self.enabled:
+            return None
+        now = time.time() if now is None else now
+        if self.timeout > 0 and now - self.start_time >= self.timeout:
+            return "timeout"
+        if self.idle_timeout > 0:
+            self._update_activity(now)
+            if now - self.last_activity >= self.idle_timeout:
+                return "idle"
+        return None
+
+    def request_diagnostics(self):
+        """ 请求用例进程输出所有线程的调用栈和最后一张截图，等待其完成或超时。"""
+        done_path = os.path.join(self.log_dir, DONE_FILE)
+        try:
+            if os.path.exists(done_path):
+                os.remove(done_path)
+            with open(os.path.join(self.log_dir, REQUEST_FILE), "w", encoding="utf-8") as f:
+                f.write(str(time.time()))
+        except OSError as e:
+            print(f"请求诊断信息失败: {e}")
+            return False
+        deadline = time.time() + DIAGNOSTICS_TIMEOUT
+        while time.time() < deadline:
+            if os.path.exists(done_path) or self.process.poll() is not None:
+                break
+            time.sleep(0.2)
+        return os.path.exists(done_path)
+
+    def trip(self, reason):
+        """ 收集诊断信息，结束进程树，并在日志目录中写入 watchdog.json 记录原因。"""
+        self.reason = reason
+        elapsed = time.time() - self.start_time
+        diagnosed = self.request_diagnostics()
+        survivors = kill_process_tree(self.process.pid)
+        if hasattr(self.process, "kill"):
+            # WarmJob 需要通过自身结束，才能让等待它的线程及时返回
+            try:
+                self.process.kill()
+            except OSError:
+                pass
+        report = {
+            "reason": reason,
+            "elapsed": round(elapsed, 3),
+            "idle": round(time.time() - self.last_activity, 3),
+            "timeout": self.timeout,
+            "idle_timeout": self.idle_timeout,
+            "diagnostics": diagnosed,
+            "survivors": [pid for pid, _ in survivors],
+        }
+        try:
+            with open(os.path.join(self.log_dir, REPORT_FILE), "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=1)
+        except OSError:
+            pass
+        return report
+
+    def wait(self, should_continue=None, poll_interval=0.1):
+        """
+        等待进程结束，期间按预算检查。返回退出码；被看门狗结束时返回 TIMEOUT_STATUS，
+        should_continue 返回 False 时直接返回 None，进程树由停止流程(teardown_processes)统一结束，
+        在这里先结束父进程会让子进程被过继，清理时就找不到它们了。
+        """
+        while self.process.poll() is None:
+            if should_continue is not None and not should_continue():
+                return None
+            reason = self.check()
+            if reason:
+                print(f"用例进程 {self.process.pid} 触发看门狗({reason})，正在收集诊断信息并结束进程树")
+                self.trip(reason)
+                self.process.wait()
+                return TIMEOUT_STATUS
+            time.sleep(poll_interval)
+        return self.process.returncode
+
+
+def get_watchdog_env(log_dir):
+    """ 让用例进程监听诊断请求所需的环境变量。"""
+    return {WATCHDOG_ENV_KEY: log_dir}
+
+
+def get_case_budget(settings, case_timeout=None):
+    """
+    计算单个用例的 (总时长预算, 无活动超时)：脚本中的 __timeout__ 优先于 setting.json 中的 case_timeout，
+    无活动超时取 setting.json 中的 idle_timeout。
+    """
+    timeout = case_timeout if case_timeout else settings.get("case_timeout", 0)
+    return float(timeout or 0), float(settings.get("idle_timeout", 0) or 0)
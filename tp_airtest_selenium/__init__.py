@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 
+import os
 import time
 import inspect
 import functools
@@ -17,7 +18,9 @@ def patch_airtest_logwrap():
     def custom_Logwrap(f, logger):
         @functools.wraps(f)
         def wrapper(*args, **kwargs):
-            from airtest.core.cv import try_log_screen
+            # 使用本包的 try_log_screen，snapshot=True 的截图同样遵循截图策略并由后台写入池写盘
+            from tp_airtest_selenium.utils.airtest_api import try_log_screen
+            from tp_airtest_selenium.utils.artifact_store import flush_artifacts
             depth = kwargs.pop('depth', None)
             start = time.time()
             m = inspect.getcallargs(f, *args, **kwargs)
@@ -47,7 +50,14 @@ def patch_airtest_logwrap():
             finally:
                 if snapshot is True:
                     try:
-                        try_log_screen(depth=len(logger.running_stack) + 1)
+                        # 浏览器驱动的方法直接截取该浏览器的画面，其他情况由 try_log_screen 使用 G.DEVICE 截图
+                        driver = args[0] if args and hasattr(args[0], "get_screenshot_as_png") else None
+                        if driver is None:
+                            try_log_screen(depth=len(logger.running_stack) + 1)
+                        else:
+                            screen = driver.screenshot()
+                            if screen is not None:
+                                try_log_screen(screen, depth=len(logger.running_stack) + 1)
                     except AttributeError:
                         pass
                 
@@ -57,6 +67,10 @@ def patch_airtest_logwrap():
                     fndata.update(G.LOGGER._extra_log_data)
                     del G.LOGGER._extra_log_data
                 # ============================================================
+
+                # 顶层步骤写入日志前等待后台写入池中的截图全部落盘，嵌套步骤的截图随顶层步骤一起等待
+                if len(logger.running_stack) == 1:
+                    flush_artifacts()
                     
                 logger.log('function', fndata, depth=depth)
                 try:
@@ -69,4 +83,9 @@ def patch_airtest_logwrap():
     airtest.core.helper.logwrap = new_logwrap
 
 # 当本模块被导入时，立即执行补丁操作
-patch_airtest_logwrap()
\ No newline at end of file
+patch_airtest_logwrap()
+
+# 由执行器启动并启用了卡死看门狗时，监听诊断请求
+from tp_airtest_selenium.utils.watchdog import WATCHDOG_ENV_KEY, start_watchdog_listener
+if os.environ.get(WATCHDOG_ENV_KEY):
+    start_watchdog_listener()
\ No newline at end of file
@@ -16,6 +16,8 @@ from airtest.core.error import TargetNotFoundError
 from airtest.aircv.cal_confidence import cal_rgb_confidence
 from .utils.serial_utils import SerialManager
 from .utils.network_utils import WifiManager, get_ip_address, ping
+from .utils.watchdog import register_driver
+from .utils.artifact_store import save_screen, write_screen
 import selenium
 import os
 import time
@@ -29,6 +31,31 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.common.action_chains import ActionChains
 from selenium.webdriver.common.actions.wheel_input import ScrollOrigin
 
+
+def _decode_png(png):
+    """ 把浏览器返回的 PNG 字节直接解码为 BGR 图像，与 aircv.imread 的结果一致。"""
+    return cv2.imdecode(np.frombuffer(png, np.uint8), cv2.IMREAD_COLOR)
+
+
+def _save_driver_screen(driver, filename=None):
+    """
+    把浏览器当前画面存入按内容寻址的截图存储，指定 filename 时写到该文件。
+    按截图策略编码和缩小，策略为 PNG 且不需要缩小时直接写入浏览器返回的 PNG，不再重新编码。
+    写盘都交给后台写入池，截图失败时与 airtest 的 try_log_screen 一样返回 None。
+    """
+    try:
+        png = driver.get_screenshot_as_png()
+    except Exception:
+        # 与 screenshot() 相同：chromedriver 升级后，back() 之后截图可能因句柄失效而失败
+        print("Unable to capture screenshot.")
+        return None
+    screen = _decode_png(png)
+    if filename:
+        height, width = screen.shape[:2]
+        return {"screen": write_screen(filename, screen, data=png), "resolution": (width, height)}
+    return save_screen(screen, data=png)
+
+
 class WebChrome(Chrome):
 
     def __init__(self, executable_path="chromedriver", port=0,
@@ -47,6 +74,7 @@ class WebChrome(Chrome):
                                             port=port, options=options, service_args=service_args,
                                             service_log_path=service_log_path,
                                             desired_capabilities=desired_capabilities)
+        register_driver(self)
         self.father_number = {0: 0}
         self.action_chains = ActionChains(self)
         self.number = 0
@@ -75,10 +103,18 @@ class WebChrome(Chrome):
         """
         try:
             with open(ST.PROJECT_ROOT + "/setting.json", "r", encoding="utf-8") as f:
-                return json.load(f)
+                settings = json.load(f)
         except FileNotFoundError:
             print("未找到 setting.json 配置文件。")
-            return {}
+            settings = {}
+        # 由执行器租用的设备配置(串口/网卡)优先于 setting.json 中的默认值
+        device_settings = os.environ.get("AIRTEST_DEVICE")
+        if device_settings:
+            try:
+                settings.update(json.loads(device_settings))
+            except ValueError:
+                print(f"解析设备配置失败: {device_settings}")
+        return settings
 
     def get_setting(self, key=None, default=None):
         """
@@ -326,7 +362,9 @@ class WebChrome(Chrome):
             _pos = loop_find(v, timeout=ST.FIND_TIMEOUT, driver=self)
         else:
             screen = self.screenshot()
-            try_log_screen(screen)
+            # 截图失败时不记录截图，坐标点击不依赖画面
+            if screen is not None:
+                try_log_screen(screen)
             _pos = v
         x, y = _pos
         # self.action_chains.move_to_element_with_offset(root_element, x, y)
@@ -412,6 +450,8 @@ class WebChrome(Chrome):
     def assert_screen(self, old_screen_path, threshold=0.9, msg=" "):
         # 1. Take new screenshot
         new_screen = self.screenshot()
+        if new_screen is None:
+            raise AssertionError("%s Unable to capture screenshot for comparison." % msg)
         self._gen_screen_log()
         # 2. Read old screenshot
         try:
@@ -509,11 +549,8 @@ class WebChrome(Chrome):
         cv2.putText(comparison_image, 'Before', (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
         cv2.putText(comparison_image, 'New (Differences Highlighted)', (w + 10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
 
-        # --- 优化点 4: 保存为无损 PNG 格式 ---
-        png_file_name = str(int(time.time())) + '_compare.png'
-        png_path = os.path.join(ST.LOG_DIR, png_file_name)
-        cv2.imwrite(png_path, comparison_image, [cv2.IMWRITE_PNG_COMPRESSION, 0])
-        try_log_screen(comparison_image, png_path)
+        # 按截图策略编码，存入按内容寻址的截图存储
+        try_log_screen(comparison_image)
 
     @logwrap
     def serial_wait_pattern(self, pattern, timeout=10,  index=0, msg="",):
@@ -789,19 +826,15 @@ class WebChrome(Chrome):
         return self._gen_screen_log(filename=filename)
     
     @logwrap
-    def full_snapshot(self, filename=None, msg="", quality=90, max_height=12000):
+    def full_snapshot(self, filename=None, msg="", quality=None, max_height=12000):
         """
         [Modified] Captures a full-page screenshot with a fallback stitching mechanism.
+        quality: JPEG/WebP quality, defaults to the artifact policy in setting.json
+        max_height: the stitched image is scaled down to this height, overrides artifact_max_height
         """
         if ST.LOG_DIR is None:
             return None
 
-        if not filename:
-            png_file_name = f"{int(time.time())}_full.png"
-            filepath = os.path.join(ST.LOG_DIR, png_file_name)
-        else:
-            filepath = os.path.join(ST.LOG_DIR, filename)
-
         # Phase 1: Capture images and get the scroll amount
         # **MODIFICATION**: Now unpacks two return values
         image_parts, scroll_amount_used = self._scroll_and_capture()
@@ -825,9 +858,13 @@ class WebChrome(Chrome):
 
         # Phase 4: Save and Log the final result
         if final_image is not None:
-            cv2.imwrite(filepath, final_image)
-            try_log_screen(final_image, filepath)
-            return {"screen": filepath}
+            if filename:
+                filepath = os.path.join(ST.LOG_DIR, filename)
+                try_log_screen(final_image, filepath, quality=quality, max_height=max_height)
+                return {"screen": filepath}
+            # 未指定文件名时存入按内容寻址的截图存储
+            saved = try_log_screen(final_image, quality=quality, max_height=max_height)
+            return {"screen": saved["screen"]}
         else:
             set_step_log("Error: Stitching failed with both primary and fallback methods.")
         
@@ -851,6 +888,10 @@ class WebChrome(Chrome):
         
         for i in range(30):
             current_screenshot_data = self.screenshot()
+            # 截图失败时丢弃这一帧，不滚动，在原位置重新截图
+            if current_screenshot_data is None:
+                time.sleep(post_scroll_delay)
+                continue
 
             if last_screenshot_data is not None and np.array_equal(last_screenshot_data, current_screenshot_data):
                 break
@@ -1011,13 +1052,10 @@ class WebChrome(Chrome):
     def _gen_screen_log(self, element=None, filename=None, ):
         if ST.LOG_DIR is None:
             return None
-        if not filename:
-            png_file_name = str(int(time.time())) + '.png'
-            png_path = os.path.join(ST.LOG_DIR, png_file_name)
-            print("this is png path:", png_path)
-            filename=png_path
-        self.screenshot(filename)
-        saved = {"screen": filename}
+        # 未指定文件名的截图存入本次运行共享的存储，相同的画面只写一次；写盘在后台完成
+        saved = _save_driver_screen(self, filename)
+        if saved is None:
+            return None
         if element:
             size = element.size
             location = element.location
@@ -1039,22 +1077,20 @@ class WebChrome(Chrome):
                 """
                 print("Unable to capture screenshot.")
         else:
-            if not ST.LOG_DIR:
-                file_path = "temp.png"
-            else:
-                file_path = os.path.join(ST.LOG_DIR, "temp.png")
+            # 直接在内存中解码浏览器返回的 PNG，不再经过 temp.png 写盘再读回，并发的会话也不会互相覆盖
             try:
-                self.save_screenshot(file_path)
-            except:
-                pass
-            screen = aircv.imread(file_path)
-            return screen
+                return _decode_png(self.get_screenshot_as_png())
+            except Exception:
+                print("Unable to capture screenshot.")
+                return None
 
     def _get_left_up_offset(self):
         window_pos = self.get_window_position()
         window_size = self.get_window_size()
         mouse = Controller()
         screen = self.screenshot()
+        if screen is None:
+            raise RuntimeError("Unable to capture screenshot, cannot locate the browser viewport.")
         screen_size = get_resolution(screen)
         offset = window_size["width"] - \
                  screen_size[0], window_size["height"] - screen_size[1]
@@ -1089,6 +1125,7 @@ class WebRemote(Remote):
                                             desired_capabilities=desired_capabilities, browser_profile=browser_profile,
                                             proxy=proxy,
                                             keep_alive=keep_alive, file_detector=file_detector, options=options)
+        register_driver(self)
         self.father_number = {0: 0}
         self.action_chains = ActionChains(self)
         self.number = 0
@@ -1353,13 +1390,10 @@ class WebRemote(Remote):
     def _gen_screen_log(self, element=None, filename=None, ):
         if ST.LOG_DIR is None:
             return None
-        if not filename:
-            png_file_name = str(int(time.time())) + '.png'
-            png_path = os.path.join(ST.LOG_DIR, png_file_name)
-            print("this is png path:", png_path)
-            filename=png_path
-        self.screenshot(filename)
-        saved = {"screen": filename}
+        # 未指定文件名的截图存入本次运行共享的存储，相同的画面只写一次；写盘在后台完成
+        saved = _save_driver_screen(self, filename)
+        if saved is None:
+            return None
         if element:
             size = element.size
             location = element.location
@@ -1381,22 +1415,20 @@ class WebRemote(Remote):
                 """
                 print("Unable to capture screenshot.")
         else:
-            if not ST.LOG_DIR:
-                file_path = "temp.png"
-            else:
-                file_path = os.path.join(ST.LOG_DIR, "temp.png")
+            # 直接在内存中解码浏览器返回的 PNG，不再经过 temp.png 写盘再读回，并发的会话也不会互相覆盖
             try:
-                self.save_screenshot(file_path)
-            except:
-                pass
-            screen = aircv.imread(file_path)
-            return screen
+                return _decode_png(self.get_screenshot_as_png())
+            except Exception:
+                print("Unable to capture screenshot.")
+                return None
 
     def _get_left_up_offset(self):
         window_pos = self.get_window_position()
         window_size = self.get_window_size()
         mouse = Controller()
         screen = self.screenshot()
+        if screen is None:
+            raise RuntimeError("Unable to capture screenshot, cannot locate the browser viewport.")
         screen_size = get_resolution(screen)
         offset = window_size["width"] - \
                  screen_size[0], window_size["height"] - screen_size[1]
@@ -1436,6 +1468,7 @@ class WebFirefox(Firefox):
                                              firefox_options=firefox_options,
                                              service_args=service_args, desired_capabilities=desired_capabilities,
                                              log_path=log_path)
+        register_driver(self)
         self.father_number = {0: 0}
         self.action_chains = ActionChains(self)
         self.number = 0
@@ -1684,13 +1717,10 @@ class WebFirefox(Firefox):
     def _gen_screen_log(self, element=None, filename=None, ):
         if ST.LOG_DIR is None:
             return None
-        if not filename:
-            png_file_name = str(int(time.time())) + '.png'
-            png_path = os.path.join(ST.LOG_DIR, png_file_name)
-            print("this is png path:", png_path)
-            filename=png_path
-        self.screenshot(filename)
-        saved = {"screen": filename}
+        # 未指定文件名的截图存入本次运行共享的存储，相同的画面只写一次；写盘在后台完成
+        saved = _save_driver_screen(self, filename)
+        if saved is None:
+            return None
         if element:
             size = element.size
             location = element.location
@@ -1712,22 +1742,20 @@ class WebFirefox(Firefox):
                 """
                 print("Unable to capture screenshot.")
         else:
-            if not ST.LOG_DIR:
-                file_path = "temp.png"
-            else:
-                file_path = os.path.join(ST.LOG_DIR, "temp.png")
+            # 直接在内存中解码浏览器返回的 PNG，不再经过 temp.png 写盘再读回，并发的会话也不会互相覆盖
             try:
-                self.save_screenshot(file_path)
-            except:
-                pass
-            screen = aircv.imread(file_path)
-            return screen
+                return _decode_png(self.get_screenshot_as_png())
+            except Exception:
+                print("Unable to capture screenshot.")
+                return None
 
     def _get_left_up_offset(self):
         window_pos = self.get_window_position()
         window_size = self.get_window_size()
         mouse = Controller()
         screen = self.screenshot()
+        if screen is None:
+            raise RuntimeError("Unable to capture screenshot, cannot locate the browser viewport.")
         screen_size = get_resolution(screen)
         offset = window_size["width"] - \
                  screen_size[0], window_size["height"] - screen_size[1]
@@ -4,16 +4,26 @@ import io
 from urllib.parse import unquote
 import airtest.report.report as report
 import json
+import threading
 import jinja2
 from airtest.core.settings import Settings as ST
 from airtest.report.report import nl2br, timefmt
+from tp_airtest_selenium.utils.console_log import load_console_index, read_console
 LOGDIR = "log"
+# 模板字节码缓存目录(相对于 ST.PROJECT_ROOT)
+TEMPLATE_CACHE_DIR = os.path.join("result", "template_cache")
+# 每个步骤在报告中最多展示的控制台输出行数(保留最后的部分)
+CONSOLE_STEP_MAX_LINES = 200
+
+_envs = {}
+_envs_lock = threading.Lock()
 
 old_trans_screen = report.LogToHtml._translate_screen
 old_trans_desc = report.LogToHtml._translate_desc
 old_trans_code = report.LogToHtml._translate_code
 old_trans_info = report.LogToHtml._translate_info
 old_render = report.LogToHtml._render
+old_trans_step = report.LogToHtml._translate_step
 
 screen_func = [
     "find_element_by_xpath", "find_element_by_id", "find_element_by_name", 
@@ -46,14 +56,18 @@ def new_trans_screen(self, step, code):
 
         src = ""
         if step["data"]["name"] in second_screen_func:
-            res = step["data"]['ret']
-            src = res["screen"]
-            if "pos" in res:
-                screen["pos"] = res["pos"]
+            res = step["data"].get('ret')
+            # 截图失败时返回 None，不显示截图
+            if res:
+                src = res["screen"]
+                if "pos" in res:
+                    screen["pos"] = res["pos"]
 
         for item in step["__children__"]:
             if item["data"]["name"] in ["_gen_screen_log", "try_log_screen"]:
-                res = item["data"]['ret']
+                res = item["data"].get('ret')
+                if not res:
+                    continue
                 src = res["screen"]
                 if "pos" in res:
                     screen["pos"] = res["pos"]
@@ -204,30 +218,77 @@ def new_translate_info(self, step):
 
     return trace_msg, log_msg
 
+def get_step_console(self, step):
+    """ 根据步骤的起止时间，通过 console.idx 读取该步骤执行期间的控制台输出。"""
+    data = step.get("data") or {}
+    start = data.get("start_time")
+    if step.get("tag") != "function" or start is None:
+        return []
+    index = getattr(self, "_console_index", None)
+    if index is None:
+        # 同一份报告只读取一次索引
+        index = self._console_index = load_console_index(self.log_root)
+    if not index:
+        return []
+    lines = read_console(self.log_root, start, data.get("end_time", start), index=index)
+    if len(lines) > CONSOLE_STEP_MAX_LINES:
+        omitted = len(lines) - CONSOLE_STEP_MAX_LINES
+        lines = [f"... 省略 {omitted} 行 ..."] + lines[-CONSOLE_STEP_MAX_LINES:]
+    return lines
+
+def new_translate_step(self, step):
+    trans = old_trans_step(self, step)
+    console = get_step_console(self, step)
+    if console:
+        trans["console"] = console
+    return trans
+
+def get_report_env(project_root):
+    """
+    同一个报告进程会连续生成很多份报告，按项目目录缓存 Jinja2 环境，
+    并把编译后的模板字节码缓存到磁盘，新启动的报告进程也不必重新解析模板。
+    """
+    with _envs_lock:
+        env = _envs.get(project_root)
+        if env is None:
+            bytecode_cache = None
+            cache_dir = os.path.join(project_root, TEMPLATE_CACHE_DIR)
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+                bytecode_cache = jinja2.FileSystemBytecodeCache(cache_dir, pattern="__report_%s.cache")
+            except OSError as e:
+                print(f"创建模板缓存目录失败: {e}")
+            # 到ST.PROJECT_ROOT/source下寻找报告模板
+            env = jinja2.Environment(
+                loader=jinja2.FileSystemLoader(os.path.join(project_root, "source")),
+                extensions=(),
+                autoescape=True,
+                bytecode_cache=bytecode_cache
+            )
+            env.filters['nl2br'] = nl2br
+            env.filters['datetime'] = timefmt
+            _envs[project_root] = env
+        return env
+
 @staticmethod
 def new_render(template_name, output_file=None, **template_vars):
-    # 到ST.PROJECT_ROOT/source下寻找报告模板
-    template_path = os.path.join(ST.PROJECT_ROOT, "source")
-    env = jinja2.Environment(
-        loader=jinja2.FileSystemLoader(template_path),
-        extensions=(),
-        autoescape=True
-    )
-    env.filters['nl2br'] = nl2br
-    env.filters['datetime'] = timefmt
-    template = env.get_template(template_name)
-    html = template.render(**template_vars)
+    template = get_report_env(ST.PROJECT_ROOT).get_template(template_name)
 
     if output_file:
+        # 边渲染边写入文件，不在内存中拼出完整的 HTML；此时返回输出文件路径
+        stream = template.stream(**template_vars)
+        stream.enable_buffering(64)
         with io.open(output_file, 'w', encoding="utf-8") as f:
-            f.write(html)
+            stream.dump(f)
         print(output_file)
+        return output_file
 
-    return html
+    return template.render(**template_vars)
 
 report.LogToHtml._render = new_render
 report.LogToHtml._translate_screen = new_trans_screen
 report.LogToHtml._translate_desc = new_translate_desc
 report.LogToHtml._translate_code = new_translate_code
 report.LogToHtml._translate_info = new_translate_info
+report.LogToHtml._translate_step = new_translate_step
 
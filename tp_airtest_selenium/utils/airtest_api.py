@@ -7,6 +7,7 @@ from airtest import aircv
 from airtest.aircv import get_resolution
 from airtest.core.error import TargetNotFoundError
 from airtest.core.settings import Settings as ST
+from tp_airtest_selenium.utils.artifact_store import save_screen, write_screen
 
 @logwrap
 def loop_find(query, driver=None, timeout=10, threshold=None, interval=0.5, intervalfunc=None):
@@ -31,10 +32,10 @@ def loop_find(query, driver=None, timeout=10, threshold=None, interval=0.5, inte
     start_time = time.time()
     while True:
         screen = driver.screenshot()
-        query.resolution = get_resolution(screen)
         if screen is None:
             print("Screen is None, may be locked")
         else:
+            query.resolution = get_resolution(screen)
             if threshold:
                 query.threshold = threshold
             match_pos = query.match_in(screen)
@@ -47,21 +48,26 @@ def loop_find(query, driver=None, timeout=10, threshold=None, interval=0.5, inte
 
         # 超时则raise，未超时则进行下次循环:
         if (time.time() - start_time) > timeout:
-            try_log_screen(screen)
+            if screen is not None:
+                try_log_screen(screen)
             raise TargetNotFoundError('Picture %s not found in screen' % query)
         else:
             time.sleep(interval)
 
 @logwrap
-def try_log_screen(screen=None, filename=None ):
+def try_log_screen(screen=None, filename=None, ext=None, quality=None, max_height=None):
     """
-    Save screenshot to file
+    Save screenshot to file, encoded and downscaled according to the artifact policy in setting.json
 
     Args:
         screen: screenshot to be saved
+        filename: target file, by default the screenshot goes to the content-addressed artifact store
+        ext: image format used by the artifact store, defaults to artifact_codec
+        quality: JPEG/WebP quality, defaults to artifact_quality or ST.SNAPSHOT_QUALITY
+        max_height: maximum height, overrides artifact_max_height
 
     Returns:
-        None
+        {"screen": path relative to ST.LOG_DIR or filename, "resolution": (w, h), "hash": ...}
 
     """
     if not ST.LOG_DIR:
@@ -69,10 +75,11 @@ def try_log_screen(screen=None, filename=None ):
     if screen is None:
         screen = G.DEVICE.snapshot()
     if not filename:
-        name = "%(time)d.jpg" % {'time': time.time() * 1000}
-        filename = os.path.join(ST.LOG_DIR, name)
+        # 相同的画面在一次运行中只写一次，日志记录指向存储中的文件和像素哈希
+        return save_screen(screen, ext=ext, quality=quality, max_height=max_height)
     if not os.path.isfile(filename):
-        aircv.imwrite(filename, screen, ST.SNAPSHOT_QUALITY)
+        # 编码和写盘交给后台写入池，步骤记录写入日志前会等待写完
+        write_screen(filename, screen, quality=quality, max_height=max_height)
     return {"screen": filename, "resolution": aircv.get_resolution(screen)}
 
 
@@ -0,0 +1,438 @@
+# -*- coding: utf-8 -*-
+# tp_airtest_selenium/utils/artifact_store.py
+
+import os
+import json
+import atexit
+import hashlib
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import cv2
+import numpy as np
+from airtest.core.settings import Settings as ST
+
+# 执行器通过该环境变量告知本次运行共享的截图目录；未设置时使用用例日志目录下的 artifacts
+ARTIFACT_ENV_KEY = "AIRTEST_ARTIFACT_DIR"
+ARTIFACT_DIR = "artifacts"
+# 感知哈希的边长，哈希共 DHASH_SIZE * DHASH_SIZE 位
+DHASH_SIZE = 32
+# 与最近截图的感知哈希相差不超过这么多位时视为同一画面。默认关闭(负数)：输入的文字、勾选框等微小变化
+# 可能落在阈值内，报告会把上一步的画面当作本步的截图；需要时在 setting.json 的 screen_dedup_tolerance 中开启。
+# 关闭时像素完全相同的截图仍由内容寻址存储复用，不会重复写盘
+DEFAULT_DEDUP_TOLERANCE = -1
+# 每个用例保留的最近截图数
+DEFAULT_DEDUP_RECENT = 8
+# 后台编码和写盘的线程数，setting.json 中的 artifact_writer_threads 可以覆盖，0 表示在调用线程中同步写入
+DEFAULT_WRITER_THREADS = 2
+# 最多允许多少张截图等待写入，超过时提交方阻塞，setting.json 中的 artifact_writer_pending 可以覆盖
+DEFAULT_WRITER_PENDING = 8
+# 截图的编码格式，setting.json 中的 artifact_codec 可以覆盖。默认 PNG 与之前的输出一致，
+# 需要缩小报告体积时再改为 jpeg 或 webp
+CODEC_EXTENSIONS = {"png": ".png", "jpeg": ".jpg", "jpg": ".jpg", "webp": ".webp"}
+DEFAULT_CODEC = "png"
+# 缩小规则: fit 按比例缩小到宽高都不超过上限，width 只限制宽度(整页截图保持原有长度)，none 不缩小
+DOWNSCALE_RULES = ("fit", "width", "none")
+DEFAULT_DOWNSCALE = "fit"
+# WebP 的最大边长，超过时按比例缩小，否则无法编码
+WEBP_MAX_SIZE = 16383
+
+_stores = {}
+_stores_lock = threading.Lock()
+_settings = {}
+_frame_index = None
+_frame_index_lock = threading.Lock()
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def hash_image(screen):
+    """ 按像素内容计算截图的哈希，尺寸不同的图片不会相同。"""
+    screen = np.ascontiguousarray(screen)
+    digest = hashlib.sha1(("%s|%s|" % (screen.shape, screen.dtype)).encode("ascii"))
+    digest.update(memoryview(screen).cast("B"))
+    return digest.hexdigest()
+
+
+def perceptual_hash(screen, hash_size=DHASH_SIZE):
+    """
+    差值哈希(dHash)：缩小为灰度图后比较相邻像素的明暗，画面的微小噪声不会改变结果。
+    缩放使用 INTER_AREA，一张 1080p 截图只需约 1ms，远低于编码和写盘的开销。
+    """
+    gray = cv2.cvtColor(screen, cv2.COLOR_BGR2GRAY) if screen.ndim == 3 else screen
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = small[:, 1:] > small[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def load_settings():
+    """ 读取项目目录下的 setting.json，同一路径只读取一次。"""
+    path = os.path.join(ST.PROJECT_ROOT or os.getcwd(), "setting.json")
+    if path not in _settings:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                _settings[path] = json.load(f)
+        except (IOError, ValueError):
+            _settings[path] = {}
+    return _settings[path]
+
+
+def encode_image(screen, ext=".jpg", quality=None):
+    """ 把截图编码为 ext 格式的字节，quality 只对 JPEG 和 WebP 有效。"""
+    params = []
+    if ext in (".jpg", ".jpeg"):
+        params = [cv2.IMWRITE_JPEG_QUALITY, int(quality or ST.SNAPSHOT_QUALITY or 90)]
+    elif ext == ".webp":
+        params = [cv2.IMWRITE_WEBP_QUALITY, int(quality or ST.SNAPSHOT_QUALITY or 90)]
+    ok, buffer = cv2.imencode(ext, screen, params)
+    if not ok:
+        raise IOError("Failed to encode screenshot as %s" % ext)
+    return buffer.tobytes()
+
+
+def write_file(path, data):
+    """ 先写临时文件再替换，读取方不会看到写了一半的图片。"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # 多个用例进程可能同时写入同一张截图，各自写临时文件后替换，内容相同所以谁先谁后都可以
+    temp_path = "%s.%d.%d.tmp" % (path, os.getpid(), threading.get_ident())
+    with open(temp_path, "wb") as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+
+class ArtifactPolicy:
+    def __init__(self, codec=DEFAULT_CODEC, quality=None, max_width=0, max_height=0, downscale=DEFAULT_DOWNSCALE):
+        """
+        截图的编码和尺寸策略，所有截图(步骤截图、整页截图、对比图)都按它编码和缩小。
+        报告中的点击位置按记录的原始分辨率换算，缩小后的截图上位置仍然正确。
+
+        Args:
+            codec (str): png、jpeg 或 webp.
+            quality (int): JPEG/WebP 质量，默认使用 ST.SNAPSHOT_QUALITY.
+            max_width (int): 最大宽度，0 表示不限制.
+            max_height (int): 最大高度，0 表示不限制.
+            downscale (str): 缩小规则，见 DOWNSCALE_RULES.
+        """
+        codec = str(codec or DEFAULT_CODEC).lower()
+        if codec not in CODEC_EXTENSIONS:
+            print("不支持的截图格式 %s，使用 %s" % (codec, DEFAULT_CODEC))
+            codec = DEFAULT_CODEC
+        downscale = str(downscale or DEFAULT_DOWNSCALE).lower()
+        if downscale not in DOWNSCALE_RULES:
+            print("不支持的缩小规则 %s，使用 %s" % (downscale, DEFAULT_DOWNSCALE))
+            downscale = DEFAULT_DOWNSCALE
+        self.ext = CODEC_EXTENSIONS[codec]
+        self.quality = int(quality) if quality else None
+        self.max_width = int(max_width or 0)
+        self.max_height = int(max_height or 0)
+        self.downscale = downscale
+
+    @classmethod
+    def from_settings(cls, settings):
+        """ 从 setting.json 的 artifact_codec / artifact_quality / artifact_max_width / artifact_max_height / artifact_downscale 创建。"""
+        return cls(
+            codec=settings.get("artifact_codec", DEFAULT_CODEC),
+            quality=settings.get("artifact_quality"),
+            max_width=settings.get("artifact_max_width", 0),
+            max_height=settings.get("artifact_max_height", 0),
+            downscale=settings.get("artifact_downscale", DEFAULT_DOWNSCALE),
+        )
+
+    def get_quality(self, quality=None):
+        """ 调用方指定的质量优先，其次是 setting.json，最后是 ST.SNAPSHOT_QUALITY。"""
+        return quality or self.quality or ST.SNAPSHOT_QUALITY
+
+    def get_size(self, shape, ext=None, max_height=None):
+        """
+        返回截图缩小后的 (宽, 高)，不需要缩小时返回 None。
+
+        Args:
+            shape (tuple): 截图的 shape.
+            ext (str): 编码格式，默认使用策略的格式.
+            max_height (int): 调用方指定的最大高度，优先于策略中的配置和缩小规则(例如整页截图).
+        """
+        height, width = shape[:2]
+        max_width = self.max_width if self.downscale != "none" else 0
+        max_height_limit = self.max_height if self.downscale == "fit" else 0
+        if max_height:
+            max_height_limit = int(max_height)
+        if (ext or self.ext) == ".webp":
+            max_width = min(max_width or WEBP_MAX_SIZE, WEBP_MAX_SIZE)
+            max_height_limit = min(max_height_limit or WEBP_MAX_SIZE, WEBP_MAX_SIZE)
+        scale = 1.0
+        if max_width and width > max_width:
+            scale = min(scale, max_width / float(width))
+        if max_height_limit and height > max_height_limit:
+            scale = min(scale, max_height_limit / float(height))
+        if scale >= 1.0:
+            return None
+        return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+def get_artifact_policy():
+    """ 按 setting.json 返回当前的截图策略。"""
+    return ArtifactPolicy.from_settings(load_settings())
+
+
+class ArtifactWriter:
+    def __init__(self, threads=DEFAULT_WRITER_THREADS, pending=DEFAULT_WRITER_PENDING):
+        """
+        后台截图写入池：测试线程提交截图和目标路径后立即拿到路径继续执行，编码和写盘在工作线程中完成
+        (cv2 编码时释放 GIL，可以与测试线程并行)。等待写入的截图数有上限，浏览器截图很快时提交方会阻塞，
+        内存占用不会无限增长。提交后的截图数组不能再被修改。
+
+        Args:
+            threads (int): 工作线程数，0 表示同步写入.
+            pending (int): 最多等待写入的截图数.
+        """
+        threads = int(threads)
+        self.executor = ThreadPoolExecutor(threads, "artifact-writer") if threads > 0 else None
+        self.slots = threading.BoundedSemaphore(max(1, int(pending)))
+        self.pending = set()
+        self.lock = threading.Lock()
+
+    def submit(self, path, screen=None, data=None, ext=None, quality=None, size=None, callback=None):
+        """
+        提交一张截图，返回 path。
+
+        Args:
+            path (str): 目标文件路径.
+            screen (numpy.ndarray): 截图像素，data 为空时在工作线程中编码.
+            data (bytes): 已经编码好的图片，提供时直接写入.
+            ext (str): 编码格式，默认按 path 的扩展名.
+            quality (int): JPEG/WebP 质量.
+            size (tuple): 缩小后的 (宽, 高)，提供时在工作线程中缩小后重新编码.
+            callback (callable): 写入结束后调用 callback(path, error)，成功时 error 为 None.
+        """
+        ext = ext or os.path.splitext(path)[1] or ".jpg"
+        args = (path, screen, data, ext, quality, size, callback)
+        if self.executor is None:
+            self._write(*args)
+            return path
+        self.slots.acquire()
+        try:
+            future = self.executor.submit(self._write, *args)
+        except RuntimeError:
+            # 解释器退出时线程池已经关闭，改为同步写入
+            self.slots.release()
+            self._write(*args)
+            return path
+        with self.lock:
+            self.pending.add(future)
+        future.add_done_callback(self._done)
+        return path
+
+    def _write(self, path, screen, data, ext, quality, size, callback):
+        try:
+            if size is not None:
+                screen = cv2.resize(screen, size, interpolation=cv2.INTER_AREA)
+                data = None
+            if data is None:
+                data = encode_image(screen, ext, quality)
+            write_file(path, data)
+        except Exception as e:
+            if callback is not None:
+                callback(path, e)
+            raise
+        if callback is not None:
+            callback(path, None)
+
+    def _done(self, future):
+        with self.lock:
+            self.pending.discard(future)
+        self.slots.release()
+        error = future.exception()
+        if error is not None:
+            print("写入截图失败: %s" % error)
+
+    def flush(self, timeout=None):
+        """ 等待已提交的截图全部写入。"""
+        with self.lock:
+            futures = list(self.pending)
+        if futures:
+            wait(futures, timeout)
+
+
+def get_artifact_writer():
+    """ 返回进程内共享的后台写入池，进程退出前会等待全部截图写入。"""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            settings = load_settings()
+            _writer = ArtifactWriter(settings.get("artifact_writer_threads", DEFAULT_WRITER_THREADS),
+                                     settings.get("artifact_writer_pending", DEFAULT_WRITER_PENDING))
+            atexit.register(_writer.flush)
+        return _writer
+
+
+def flush_artifacts(timeout=None):
+    """ 等待后台写入池中的截图全部写入，尚未创建写入池时直接返回。"""
+    if _writer is not None:
+        _writer.flush(timeout)
+
+
+def write_screen(path, screen, data=None, quality=None, max_height=None):
+    """
+    按截图策略把截图交给后台写入池写到指定路径，立即返回 path。编码格式由 path 的扩展名决定，
+    质量和尺寸遵循策略；data 为浏览器返回的 PNG 字节，只有写入 PNG 且不需要缩小时才直接使用。
+    """
+    policy = get_artifact_policy()
+    ext = os.path.splitext(path)[1].lower() or policy.ext
+    if ext != ".png":
+        data = None
+    return get_artifact_writer().submit(path, screen=screen, data=data, ext=ext, quality=policy.get_quality(quality),
+                                        size=policy.get_size(screen.shape, ext, max_height))
+
+
+class ArtifactStore:
+    def __init__(self, root):
+        """
+        按内容寻址的截图存储：文件名是截图像素的哈希，内容相同的截图在一次运行中只写入一次，
+        各用例的 log.txt 只记录指向它的路径和哈希。
+
+        Args:
+            root (str): 存储目录，文件按 <哈希前两位>/<哈希><扩展名> 存放.
+        """
+        self.root = root
+        self.known = set()
+        self.writing = set()
+        self.lock = threading.Lock()
+
+    def get_path(self, digest, ext):
+        return os.path.join(self.root, digest[:2], digest + ext)
+
+    def put(self, screen, data=None, ext=".jpg", quality=None, size=None):
+        """
+        存入一张截图，返回 (文件路径, 哈希)。已经存在相同内容时不再编码和写盘，
+        否则交给后台写入池，返回时文件可能尚未写完。
+
+        Args:
+            screen (numpy.ndarray): 截图像素.
+            data (bytes): 已经编码好的图片(例如浏览器返回的 PNG)，提供时直接写入.
+            ext (str): 文件扩展名，决定编码格式.
+            quality (int): JPEG/WebP 质量，默认使用 ST.SNAPSHOT_QUALITY.
+            size (tuple): 缩小后的 (宽, 高).
+        """
+        digest = hash_image(screen)
+        path = self.get_path(digest, ext)
+        with self.lock:
+            if path in self.known or path in self.writing:
+                return path, digest
+            # 正在写入的截图不会被重复提交，写入成功后才记为已存在，失败时下一张相同的截图会重新写入
+            self.writing.add(path)
+        if os.path.isfile(path):
+            self._written(path, None)
+        else:
+            get_artifact_writer().submit(path, screen=screen, data=data, ext=ext, quality=quality, size=size,
+                                         callback=self._written)
+        return path, digest
+
+    def _written(self, path, error):
+        with self.lock:
+            self.writing.discard(path)
+            if error is None:
+                self.known.add(path)
+
+
+class FrameIndex:
+    def __init__(self, tolerance=DEFAULT_DEDUP_TOLERANCE, recent=DEFAULT_DEDUP_RECENT):
+        """
+        最近截图的感知哈希索引。很多步骤(back、forward、每次 find_element_by_*、switch_to_new_tab)
+        截到的画面与上一步相同，命中时直接复用已保存的文件，省去编码和写盘。
+
+        Args:
+            tolerance (int): 允许的感知哈希差异位数.
+            recent (int): 保留的最近截图数.
+        """
+        self.tolerance = int(tolerance)
+        self.frames = deque(maxlen=max(1, int(recent)))
+        self.lock = threading.Lock()
+
+    def find(self, screen, key=None):
+        """
+        返回 (感知哈希, 匹配到的日志记录)，没有相近的截图时记录为 None。
+        key 为编码参数(格式、质量、缩小后的尺寸)，参数不同的截图不会复用。
+        """
+        phash = perceptual_hash(screen)
+        with self.lock:
+            # 从最近的截图开始比较，尺寸不同的画面不会匹配
+            for frame_hash, shape, frame_key, record in reversed(self.frames):
+                if (shape == screen.shape and frame_key == key
+                        and bin(frame_hash ^ phash).count("1") <= self.tolerance):
+                    return phash, record
+        return phash, None
+
+    def add(self, phash, shape, record, key=None):
+        with self.lock:
+            self.frames.append((phash, shape, key, record))
+
+
+def get_frame_index():
+    """
+    返回当前用例的截图索引，setting.json 中 screen_dedup_tolerance 未配置或为负数时返回 None。
+    索引按 ST.LOG_DIR 区分，预热进程执行下一个用例时重新建立。
+    """
+    global _frame_index
+    settings = load_settings()
+    tolerance = settings.get("screen_dedup_tolerance", DEFAULT_DEDUP_TOLERANCE)
+    if tolerance is None or int(tolerance) < 0:
+        return None
+    with _frame_index_lock:
+        if _frame_index is None or _frame_index[0] != ST.LOG_DIR:
+            _frame_index = (ST.LOG_DIR, FrameIndex(tolerance, settings.get("screen_dedup_recent",
+                                                                           DEFAULT_DEDUP_RECENT)))
+        return _frame_index[1]
+
+
+def get_artifact_store():
+    """
+    返回当前用例使用的截图存储。预热进程中每个用例的环境变量和日志目录不同，每次调用时重新确定目录。
+    """
+    root = os.environ.get(ARTIFACT_ENV_KEY) or os.path.join(ST.LOG_DIR, ARTIFACT_DIR)
+    root = os.path.abspath(root)
+    with _stores_lock:
+        store = _stores.get(root)
+        if store is None:
+            store = _stores[root] = ArtifactStore(root)
+        return store
+
+
+def save_screen(screen, data=None, ext=None, quality=None, max_height=None):
+    """
+    把截图存入内容寻址存储，返回写入日志的记录：screen 为相对于 ST.LOG_DIR 的路径，
+    与报告 log.html 所在的目录一致，整个运行目录拷贝到别处后仍然可以打开。
+    开启 screen_dedup_tolerance 时，与最近的截图几乎相同且编码参数一致时直接复用其记录，不再计算内容哈希、编码和写盘。
+    编码格式、质量和尺寸遵循截图策略，resolution 记录缩小前的分辨率。
+
+    Args:
+        screen (numpy.ndarray): 截图像素.
+        data (bytes): 浏览器返回的 PNG 字节，只有写入 PNG 且不需要缩小时才直接使用.
+        ext (str): 编码格式，默认使用策略中的格式.
+        quality (int): JPEG/WebP 质量，默认使用策略中的质量.
+        max_height (int): 最大高度，优先于策略中的配置.
+    """
+    policy = get_artifact_policy()
+    ext = ext or policy.ext
+    quality = policy.get_quality(quality)
+    size = policy.get_size(screen.shape, ext, max_height)
+    key = (ext, quality, size)
+    index = get_frame_index()
+    if index is not None:
+        phash, record = index.find(screen, key)
+        if record is not None:
+            return dict(record)
+    if ext != ".png":
+        data = None
+    path, digest = get_artifact_store().put(screen, data=data, ext=ext, quality=quality, size=size)
+    try:
+        screen_path = os.path.relpath(path, ST.LOG_DIR).replace("\\", "/")
+    except ValueError:
+        screen_path = path
+    height, width = screen.shape[:2]
+    record = {"screen": screen_path, "resolution": (width, height), "hash": digest}
+    if index is not None:
+        index.add(phash, screen.shape, record, key)
+    return dict(record)
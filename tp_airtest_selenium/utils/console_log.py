@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+# tp_airtest_selenium/utils/console_log.py
+
+import os
+import bisect
+
+# 与 Airtest-Runner/log_utils.py 中 ConsoleWriter 写入的文件名保持一致
+CONSOLE_FILE = "console.log"
+CONSOLE_INDEX_FILE = "console.idx"
+
+
+def load_console_index(log_dir):
+    """ 读取 console.idx，返回按时间排序的 [(时间戳, 偏移), ...]。"""
+    entries = []
+    try:
+        with open(os.path.join(log_dir, CONSOLE_INDEX_FILE), "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    timestamp, offset = line.split("\t")
+                    entries.append((float(timestamp), int(offset)))
+                except ValueError:
+                    continue
+    except IOError:
+        pass
+    return entries
+
+
+def read_console(log_dir, start=None, end=None, index=None):
+    """
+    按时间窗口读取 console.log，只读取 [start, end] 覆盖的部分而不加载整个文件。
+    窗口边界以索引间隔为粒度向外取整。
+
+    Args:
+        log_dir (str): 用例的日志目录.
+        start (float): 起始时间戳，None 表示从头开始.
+        end (float): 结束时间戳，None 表示读到结尾.
+        index (list): 已经读取的索引，避免重复读取 console.idx.
+
+    Returns:
+        list: 窗口内的输出行.
+    """
+    index = load_console_index(log_dir) if index is None else index
+    timestamps = [timestamp for timestamp, _ in index]
+    begin_offset = 0
+    end_offset = None
+    if start is not None and index:
+        # 最后一个不晚于 start 的索引点
+        position = bisect.bisect_right(timestamps, start) - 1
+        begin_offset = index[max(0, position)][1]
+    if end is not None and index:
+        # 第一个晚于 end 的索引点
+        position = bisect.bisect_right(timestamps, end)
+        if position < len(index):
+            end_offset = index[position][1]
+    try:
+        with open(os.path.join(log_dir, CONSOLE_FILE), "rb") as f:
+            f.seek(begin_offset)
+            data = f.read() if end_offset is None else f.read(max(0, end_offset - begin_offset))
+    except IOError:
+        return []
+    return data.decode("utf-8", errors="replace").splitlines()
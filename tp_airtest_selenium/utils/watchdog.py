@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+# tp_airtest_selenium/utils/watchdog.py
+
+import os
+import time
+import weakref
+import threading
+import faulthandler
+
+# 执行器通过该环境变量告知用例进程的诊断目录(即用例的日志目录)
+WATCHDOG_ENV_KEY = "AIRTEST_WATCHDOG_DIR"
+REQUEST_FILE = "watchdog.request"
+DONE_FILE = "watchdog.done"
+STACK_FILE = "watchdog_stack.txt"
+SCREEN_FILE = "watchdog_screen.png"
+
+_drivers = weakref.WeakSet()
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def register_driver(driver):
+    """ 记录当前进程中创建的浏览器驱动，用于卡死时截取最后的画面。"""
+    try:
+        _drivers.add(driver)
+    except TypeError:
+        pass
+
+
+def dump_diagnostics(diag_dir):
+    """
+    把所有线程的 Python 调用栈写入 watchdog_stack.txt，并用仍然存活的浏览器驱动截取一张图片，
+    完成后写入 watchdog.done 通知执行器。
+    """
+    try:
+        with open(os.path.join(diag_dir, STACK_FILE), "w", encoding="utf-8") as f:
+            f.write(f"# {time.strftime('%Y-%m-%d %H:%M:%S')} pid={os.getpid()}\n")
+            f.flush()
+            faulthandler.dump_traceback(file=f, all_threads=True)
+    except Exception as e:
+        print(f"写入调用栈失败: {e}")
+    for driver in list(_drivers):
+        try:
+            driver.get_screenshot_as_file(os.path.join(diag_dir, SCREEN_FILE))
+            break
+        except Exception as e:
+            print(f"卡死诊断截图失败: {e}")
+    with open(os.path.join(diag_dir, DONE_FILE), "w", encoding="utf-8") as f:
+        f.write(str(time.time()))
+
+
+def _listen(poll_interval):
+    while True:
+        # 预热进程中每个用例的环境变量不同，每次轮询时重新读取
+        diag_dir = os.environ.get(WATCHDOG_ENV_KEY)
+        if diag_dir:
+            request_path = os.path.join(diag_dir, REQUEST_FILE)
+            if os.path.exists(request_path):
+                try:
+                    os.remove(request_path)
+                except OSError:
+                    pass
+                dump_diagnostics(diag_dir)
+        time.sleep(poll_interval)
+
+
+def start_watchdog_listener(poll_interval=0.5):
+    """
+    在后台线程中等待执行器的诊断请求。主线程卡在元素查找或串口等待中时，
+    这个线程仍然可以输出调用栈和截图，然后由执行器结束整个进程树。
+    """
+    global _listener
+    with _listener_lock:
+        if _listener is None:
+            _listener = threading.Thread(target=_listen, args=(poll_interval,), daemon=True)
+            _listener.start()